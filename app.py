@@ -1,68 +1,107 @@
 import os
 import json
+import tempfile
+import click
 from datetime import datetime
 from functools import wraps, partial
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_file
-from supabase import create_client, Client
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, Blueprint, render_template, request, redirect, url_for, session, jsonify, send_file, Response, stream_with_context
 from io import BytesIO
 from dotenv import load_dotenv
 
-# Imports do ReportLab para o PDF
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT, TA_JUSTIFY
-
-app = Flask(__name__)
-app.secret_key = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
-
+# Antes dos módulos locais: eles leem as variáveis de ambiente ao serem importados
 load_dotenv()
 
-# Supabase
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_KEY")
+# PDFs: o ReportLab (pdf_proposta) só é importado na primeira geração, ou no
+# create_app com PDF_PRELOAD=1 (gunicorn --preload, compartilhado entre os workers)
+from pdf_cache import PdfCache, chave_pdf, nome_arquivo
+from exportacao import gerar_zip, renderizar_pdf
+from fila_pdf import FilaCheia, FilaPdf
+from paginacao import CursorInvalido, buscar_pagina
+from precificacao import ErroPrecificacao, calcular_cenarios, calcular_grade, custo_hora, para_json, resumo_custos
+from orcamentos import ler_orcamento, montar_orcamento
+from compactacao import compactar as compactar_orcamentos
+from importacao import LOTE_PADRAO, importar, leitor_para
+
+# Acesso ao Supabase (cliente HTTP/2 compartilhado, timeouts e tempos por consulta)
+import dados
+import cache_http
+import estatisticas
+import estaticos
+import fragmentos
+import metricas
+import operacoes_lote
+import senhas
+
+# Rotas do app; registradas na aplicação por create_app()
+bp = Blueprint('web', __name__, cli_group=None)
+
+# Cache dos PDFs renderizados (memória do worker + diretório opcional compartilhado)
+pdf_cache = PdfCache(
+    max_bytes=int(os.getenv("PDF_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    diretorio=os.getenv("PDF_CACHE_DIR") or None
+)
+
+# Fila de PDFs assíncrona, compartilhada pelos workers (a interface só a usa com PDF_ASYNC=1)
+PDF_ASYNC = os.getenv("PDF_ASYNC", "0") == "1"
+fila_pdf = FilaPdf(
+    diretorio=os.getenv("PDF_JOBS_DIR") or os.path.join(tempfile.gettempdir(), 'lorena-pdf-jobs'),
+    concorrencia=int(os.getenv("PDF_JOBS_CONCORRENCIA", "2")),
+    ttl=int(os.getenv("PDF_JOBS_TTL", "600")),
+    max_pendentes=int(os.getenv("PDF_JOBS_MAX_PENDENTES", "200")),
+    ao_concluir=lambda job, pdf: pdf_cache.put(job['chave'], job['usuario_id'], job['orcamento_id'], pdf)
 )
 
+# Tamanho da página do histórico
+HISTORICO_PAGINA = int(os.getenv("HISTORICO_PAGINA", "20"))
+
+# Limite de orçamentos por exportação em ZIP
+EXPORT_MAX = int(os.getenv("EXPORT_MAX", "500"))
+LOTE_MAX = int(os.getenv("OPERACOES_LOTE_MAX", "500"))
+
 # Decorator para rotas protegidas
 def login_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         if 'logged_in' not in session or 'user_id' not in session:
-            return redirect(url_for('login'))
+            return redirect(url_for('web.login'))
         return f(*args, **kwargs)
     return decorated
 
 # ============== ROTAS DE AUTENTICAÇÃO ==============
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         email = request.form.get('email')
         senha = request.form.get('senha')
         
         try:
-            # Buscar usuário no Supabase
-            response = supabase.table('lorena-usuarios').select('*').eq('email', email).eq('ativo', True).execute()
+            # Buscar usuário no Supabase (só as colunas usadas aqui)
+            user = dados.buscar_usuario_ativo_por_email(email, colunas='id, nome_completo, senha_hash')
             
-            if response.data and len(response.data) > 0:
-                user = response.data[0]
-                if check_password_hash(user['senha_hash'], senha):
+            if user:
+                if senhas.verificar(user['senha_hash'], senha):
+                    # Hash antigo (outra política): regrava com a atual, sem impedir o login
+                    if senhas.precisa_atualizar(user['senha_hash']):
+                        try:
+                            dados.atualizar_usuario(user['id'], {'senha_hash': senhas.gerar_hash(senha)})
+                        except Exception:
+                            metricas.registrar_erro()
                     session['logged_in'] = True
                     session['user_id'] = user['id']
                     session['user_nome'] = user['nome_completo']
-                    return redirect(url_for('dashboard'))
+                    return redirect(url_for('web.dashboard'))
             
             return render_template('login.html', erro='Email ou senha incorretos')
+        except senhas.SenhaOcupada:
+            return render_template('login.html', erro='Muitos acessos no momento, tente novamente em instantes'), 503, {'Retry-After': '5'}
         except Exception as e:
+            metricas.registrar_erro()
             return render_template('login.html', erro='Erro ao fazer login')
     
     return render_template('login.html')
 
-@app.route('/registro', methods=['GET', 'POST'])
+@bp.route('/registro', methods=['GET', 'POST'])
 def registro():
     if request.method == 'POST':
         nome = request.form.get('nome_completo')
@@ -73,12 +112,11 @@ def registro():
         
         try:
             # Verificar se email já existe
-            existing = supabase.table('lorena-usuarios').select('id').eq('email', email).execute()
-            if existing.data and len(existing.data) > 0:
+            if dados.email_cadastrado(email):
                 return render_template('registro.html', erro='Email já cadastrado')
             
             # Criar usuário
-            senha_hash = generate_password_hash(senha)
+            senha_hash = senhas.gerar_hash(senha)
             user_data = {
                 'nome_completo': nome,
                 'email': email,
@@ -87,10 +125,9 @@ def registro():
                 'telefone': telefone
             }
             
-            response = supabase.table('lorena-usuarios').insert(user_data).execute()
+            user = dados.criar_usuario(user_data)
             
-            if response.data:
-                user = response.data[0]
+            if user:
                 # Criar custos fixos padrão
                 custos_default = {
                     'usuario_id': user['id'],
@@ -102,50 +139,52 @@ def registro():
                     'outros_custos': 0.00,
                     'horas_trabalhadas_mes': 160
                 }
-                supabase.table('lorena-custos_fixos').insert(custos_default).execute()
+                dados.criar_custos_fixos(custos_default)
                 
-                return redirect(url_for('login'))
+                return redirect(url_for('web.login'))
         except Exception as e:
+            metricas.registrar_erro()
             return render_template('registro.html', erro=f'Erro ao criar conta: {str(e)}')
     
     return render_template('registro.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('web.login'))
 
 # ============== ROTAS PRINCIPAIS ==============
 
-@app.route('/')
+@bp.route('/')
 @login_required
 def dashboard():
     return render_template('dashboard.html', user_nome=session.get('user_nome'))
 
-@app.route('/novo-calculo')
+@bp.route('/novo-calculo')
 @login_required
 def novo_calculo():
     # Buscar custos fixos do usuário
     try:
-        response = supabase.table('lorena-custos_fixos').select('*').eq('usuario_id', session['user_id']).execute()
-        custos_fixos = response.data[0] if response.data else None
-    except:
+        custos_fixos = dados.buscar_custos_fixos(session['user_id'])
+    except Exception:
+        metricas.registrar_erro()
         custos_fixos = None
     
-    return render_template('novo_calculo.html', custos_fixos=custos_fixos)
+    return render_template('novo_calculo.html', custos_fixos=custos_fixos, resumo_custos=resumo_custos(custos_fixos))
 
-@app.route('/historico')
+@bp.route('/historico')
 @login_required
 def historico():
+    termo = request.args.get('q', '').strip()
     try:
-        response = supabase.table('lorena-orcamentos').select('*').eq('usuario_id', session['user_id']).order('created_at', desc=True).execute()
-        orcamentos = response.data
-    except:
-        orcamentos = []
+        orcamentos, proximo_cursor = buscar_pagina(session['user_id'], termo=termo, limite=HISTORICO_PAGINA)
+    except Exception:
+        metricas.registrar_erro()
+        orcamentos, proximo_cursor = [], None
     
-    return render_template('historico.html', orcamentos=orcamentos)
+    return render_template('historico.html', orcamentos=orcamentos, proximo_cursor=proximo_cursor, termo=termo, pdf_async=PDF_ASYNC)
 
-@app.route('/custos-fixos', methods=['GET', 'POST'])
+@bp.route('/custos-fixos', methods=['GET', 'POST'])
 @login_required
 def custos_fixos():
     if request.method == 'POST':
@@ -161,30 +200,24 @@ def custos_fixos():
                 'horas_trabalhadas_mes': int(request.form.get('horas_trabalhadas_mes', 160))
             }
             
-            # Verificar se já existe
-            existing = supabase.table('lorena-custos_fixos').select('id').eq('usuario_id', session['user_id']).execute()
+            # Update ou insert, conforme já exista
+            dados.salvar_custos_fixos(session['user_id'], custos_data)
             
-            if existing.data and len(existing.data) > 0:
-                # Update
-                supabase.table('lorena-custos_fixos').update(custos_data).eq('usuario_id', session['user_id']).execute()
-            else:
-                # Insert
-                supabase.table('lorena-custos_fixos').insert(custos_data).execute()
-            
-            return redirect(url_for('custos_fixos'))
+            return redirect(url_for('web.custos_fixos'))
         except Exception as e:
+            metricas.registrar_erro()
             return render_template('custos_fixos.html', erro=f'Erro ao salvar: {str(e)}')
     
     # GET
     try:
-        response = supabase.table('lorena-custos_fixos').select('*').eq('usuario_id', session['user_id']).execute()
-        custos = response.data[0] if response.data else None
-    except:
+        custos = dados.buscar_custos_fixos(session['user_id'])
+    except Exception:
+        metricas.registrar_erro()
         custos = None
     
     return render_template('custos_fixos.html', custos=custos)
 
-@app.route('/configuracoes', methods=['GET', 'POST'])
+@bp.route('/configuracoes', methods=['GET', 'POST'])
 @login_required
 def configuracoes():
     if request.method == 'POST':
@@ -198,306 +231,405 @@ def configuracoes():
             # Atualizar senha se fornecida
             nova_senha = request.form.get('nova_senha')
             if nova_senha:
-                update_data['senha_hash'] = generate_password_hash(nova_senha)
+                update_data['senha_hash'] = senhas.gerar_hash(nova_senha)
             
-            supabase.table('lorena-usuarios').update(update_data).eq('id', session['user_id']).execute()
+            dados.atualizar_usuario(session['user_id'], update_data)
             session['user_nome'] = update_data['nome_completo']
+            pdf_cache.invalidar_usuario(session['user_id'])
             
-            return redirect(url_for('configuracoes'))
+            return redirect(url_for('web.configuracoes'))
         except Exception as e:
+            metricas.registrar_erro()
             return render_template('configuracoes.html', erro=f'Erro ao atualizar: {str(e)}')
     
     # GET
     try:
-        response = supabase.table('lorena-usuarios').select('*').eq('id', session['user_id']).execute()
-        user = response.data[0] if response.data else None
-    except:
+        user = dados.buscar_usuario(session['user_id'])
+    except Exception:
+        metricas.registrar_erro()
         user = None
     
     return render_template('configuracoes.html', user=user)
 
 # ============== API ENDPOINTS ==============
 
-@app.route('/api/salvar-orcamento', methods=['POST'])
+@bp.route('/api/salvar-orcamento', methods=['POST'])
 @login_required
 def salvar_orcamento():
     try:
         data = request.json
         
-        # Gerar número único
-        numero = f"PER-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        orcamento_data = {
-            'usuario_id': session['user_id'],
-            'numero': numero,
-            'nome_cliente': data.get('nome_cliente'),
-            'telefone_cliente': data.get('telefone_cliente'),
-            'tipo_servico': data.get('tipo_servico'),
-            'valor_base': float(data.get('valor_base', 0)),
-            'horas_analise': float(data.get('horas_analise', 0)),
-            'grau_urgencia': int(data.get('grau_urgencia', 0)),
-            'grau_especificidade': int(data.get('grau_especificidade', 0)),
-            'grau_complexidade': int(data.get('grau_complexidade', 0)),
-            'ajustes': json.dumps(data.get('ajustes', [])),
-            'valor_ajustado': float(data.get('valor_ajustado', 0)),
-            'taxa_horaria': float(data.get('taxa_horaria', 0)),
-            'custo_horas_analise': float(data.get('custo_horas_analise', 0)),
-            'subtotal_fixo': float(data.get('subtotal_fixo', 0)),
-            'valor_total': float(data.get('valor_total', 0)),
-            'opcoes_pagamento': json.dumps(data.get('opcoes_pagamento', [])),
-            'observacoes': data.get('observacoes'),
-            'dados_completos': json.dumps(data)
-        }
+        orcamento_data = montar_orcamento(data, session['user_id'])
+        numero = orcamento_data['numero']
         
-        response = supabase.table('lorena-orcamentos').insert(orcamento_data).execute()
+        orcamento = dados.inserir_orcamento(orcamento_data)
         
-        if response.data:
-            return jsonify({'success': True, 'id': response.data[0]['id'], 'numero': numero})
+        if orcamento:
+            estatisticas.registrar([orcamento])
+            return jsonify({'success': True, 'id': orcamento['id'], 'numero': numero})
         else:
             return jsonify({'success': False, 'error': 'Erro ao salvar orçamento'}), 400
     except Exception as e:
+        metricas.registrar_erro()
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/orcamento/<int:id>')
+@bp.route('/api/importar-orcamentos', methods=['POST'])
+@login_required
+def importar_orcamentos():
+    # multipart: arquivo (CSV ou JSONL), formato e lote opcionais
+    arquivo = request.files.get('arquivo')
+    if not arquivo:
+        return jsonify({'error': 'Envie o arquivo no campo "arquivo"'}), 400
+    
+    try:
+        leitor = leitor_para(arquivo.filename, request.form.get('formato'))
+        lote = int(request.form.get('lote') or LOTE_PADRAO)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    relatorio = importar(leitor(arquivo.stream), session['user_id'], lote=max(1, min(lote, 1000)))
+    return jsonify(relatorio)
+
+@bp.route('/api/historico')
+@login_required
+def historico_pagina():
+    try:
+        orcamentos, proximo_cursor = buscar_pagina(
+            session['user_id'],
+            cursor=request.args.get('cursor'),
+            termo=request.args.get('q', '').strip(),
+            limite=HISTORICO_PAGINA
+        )
+        html = ''.join(fragmentos.card_orcamento(orc) for orc in orcamentos)
+        return jsonify({'itens': orcamentos, 'html': html, 'proximo_cursor': proximo_cursor})
+    except CursorInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        metricas.registrar_erro()
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/calcular', methods=['POST'])
+@login_required
+def calcular():
+    # Aceita uma lista de cenários, {"cenarios": [...]} ou {"grade": {campo: [valores]}};
+    # "campos" opcional limita as colunas devolvidas
+    data = request.get_json(silent=True)
+    try:
+        try:
+            taxa_custo = custo_hora(dados.buscar_custos_fixos(session['user_id']))
+        except Exception:
+            metricas.registrar_erro()
+            taxa_custo = 0.0
+        
+        if isinstance(data, list):
+            resultado = calcular_cenarios(data, taxa_custo)
+        elif isinstance(data, dict) and isinstance(data.get('grade'), dict):
+            resultado = calcular_grade(data['grade'], taxa_custo)
+        elif isinstance(data, dict) and isinstance(data.get('cenarios'), list):
+            resultado = calcular_cenarios(data['cenarios'], taxa_custo)
+        else:
+            return jsonify({'error': 'Informe cenarios ou grade'}), 400
+        
+        return jsonify({
+            'total': int(resultado['valor_total'].size),
+            'custo_hora': round(taxa_custo, 2),
+            'resultados': para_json(resultado, data.get('campos') if isinstance(data, dict) else None)
+        })
+    except ErroPrecificacao as e:
+        return jsonify({'error': str(e)}), 400
+
+@bp.route('/api/dashboard/estatisticas')
+@login_required
+def estatisticas_dashboard():
+    # Lê só os agregados mensais: custo constante, independente do tamanho do histórico
+    try:
+        meses = min(max(request.args.get('meses', 12, type=int), 1), 120)
+        return jsonify(estatisticas.resumo(session['user_id'], meses=meses))
+    except Exception as e:
+        metricas.registrar_erro()
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/api/orcamento/<int:id>')
 @login_required
 def get_orcamento(id):
     try:
-        response = supabase.table('lorena-orcamentos').select('*').eq('id', id).eq('usuario_id', session['user_id']).execute()
+        orcamento = dados.buscar_orcamento(session['user_id'], id)
         
-        if response.data and len(response.data) > 0:
-            return jsonify(response.data[0])
+        if orcamento:
+            corpo = ler_orcamento(orcamento)
+            return cache_http.condicional(jsonify(corpo), cache_http.etag_json(corpo))
         else:
             return jsonify({'error': 'Orçamento não encontrado'}), 404
     except Exception as e:
+        metricas.registrar_erro()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/deletar-orcamento/<int:id>', methods=['DELETE'])
+@bp.route('/api/deletar-orcamento/<int:id>', methods=['DELETE'])
 @login_required
 def deletar_orcamento(id):
     try:
-        supabase.table('lorena-orcamentos').delete().eq('id', id).eq('usuario_id', session['user_id']).execute()
+        removidos = dados.deletar_orcamento(session['user_id'], id).data or []
+        estatisticas.registrar(removidos, sinal=-1)
+        pdf_cache.invalidar_orcamento(session['user_id'], id)
         return jsonify({'success': True})
     except Exception as e:
+        metricas.registrar_erro()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@bp.route('/api/orcamentos/lote', methods=['POST'])
+@login_required
+def operacao_lote():
+    # {"operacao": "excluir" | "duplicar" | "reprecificar", "ids": [...],
+    #  "valores": {"taxa_horaria", "taxa_pelos_custos", "grau_urgencia", ...}}
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    # Lista de inteiros JSON: int() aceitaria "12" (virando [1, 2]), 1.5 e true
+    if not isinstance(ids, list) or any(isinstance(i, bool) or not isinstance(i, int) for i in ids):
+        return jsonify({'error': 'ids deve ser uma lista de números inteiros'}), 400
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return jsonify({'error': 'Informe os ids'}), 400
+    if len(ids) > LOTE_MAX:
+        return jsonify({'error': f'Máximo de {LOTE_MAX} orçamentos por operação'}), 400
+
+    operacao = data.get('operacao')
+    if operacao not in operacoes_lote.OPERACOES:
+        return jsonify({'error': f"operacao deve ser uma de: {', '.join(operacoes_lote.OPERACOES)}"}), 400
+    valores = data.get('valores')
+    if valores is not None and not isinstance(valores, dict):
+        return jsonify({'error': 'valores deve ser um objeto'}), 400
+
+    usuario_id = session['user_id']
+    try:
+        resultado = operacoes_lote.executar(operacao, usuario_id, ids, valores)
+    except ErroPrecificacao as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        metricas.registrar_erro()
+        return jsonify({'error': str(e)}), 500
+
+    if operacao in ('excluir', 'reprecificar'):
+        alterados = [r['id'] for r in resultado['resultados'] if r['ok']]
+        for id in alterados:
+            pdf_cache.invalidar_orcamento(usuario_id, id)
+        fragmentos.invalidar_cards(alterados)
+    return jsonify(resultado)
+
 # =======================================================
 # NOVA ROTA DE GERAÇÃO DE PDF (CLEAN & ALTO PADRÃO)
 # =======================================================
 
-@app.route('/api/gerar-pdf/<int:id>')
+def _dados_pdf(usuario_id, id):
+    orcamento, user = dados.em_paralelo(
+        partial(dados.buscar_orcamento, usuario_id, id),
+        partial(dados.buscar_usuario, usuario_id)
+    )
+    # CORREÇÃO DO ERRO: Se o supabase retornou uma string JSON, converte para dict
+    if isinstance(orcamento, str):
+        orcamento = json.loads(orcamento)
+    if isinstance(user, str):
+        user = json.loads(user)
+    return orcamento, user
+
+@bp.route('/api/gerar-pdf/<int:id>')
 @login_required
 def gerar_pdf(id):
     try:
-        # 1. Buscar dados do Orçamento
-        response = supabase.table('lorena-orcamentos').select('*').eq('id', id).eq('usuario_id', session['user_id']).execute()
+        # 1. Buscar orçamento e usuário (consultas independentes, em paralelo)
+        usuario_id = session['user_id']
+        orcamento, user = _dados_pdf(usuario_id, id)
         
-        if not response.data:
+        if not orcamento:
             return "Orçamento não encontrado", 404
-        
-        orcamento = response.data[0]
-        
-        # CORREÇÃO DO ERRO: Se o supabase retornou uma string JSON, converte para dict
-        if isinstance(orcamento, str):
-            orcamento = json.loads(orcamento)
 
-        # 2. Buscar dados do Usuário
-        user_response = supabase.table('lorena-usuarios').select('*').eq('id', session['user_id']).execute()
-        
-        if not user_response.data:
+        # 2. Dados do Usuário
+        if not user:
             return "Usuário não encontrado", 404
-            
-        user = user_response.data[0]
-        
-        # CORREÇÃO DO ERRO: Mesma segurança para o usuário
-        if isinstance(user, str):
-            user = json.loads(user)
-        
-        # 3. Configuração do PDF
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(
-            buffer, 
-            pagesize=A4, 
-            topMargin=25*mm,
-            bottomMargin=20*mm, 
-            leftMargin=20*mm, 
-            rightMargin=20*mm
-        )
-        
-        elements = []
-        styles = getSampleStyleSheet()
         
-        # Cores e Estilos
-        COLOR_PRIMARY = colors.HexColor('#059669')
-        COLOR_DARK = colors.HexColor('#111827')
-        COLOR_GRAY = colors.HexColor('#6b7280')
+        # 3. A chave do cache é o hash de tudo que vai no PDF: serve de ETag,
+        # e o navegador que já tem esta versão recebe 304 sem renderizar nada
+        chave = chave_pdf(orcamento, user)
+        if cache_http.ainda_valido(chave):
+            return cache_http.nao_modificado(chave)
         
-        # Estilos Personalizados
-        style_title = ParagraphStyle('DocTitle', parent=styles['Heading1'], fontSize=16, textColor=COLOR_DARK, alignment=TA_RIGHT, spaceAfter=2)
-        style_subtitle = ParagraphStyle('DocSub', parent=styles['Normal'], fontSize=10, textColor=COLOR_PRIMARY, alignment=TA_RIGHT)
-        style_section = ParagraphStyle('Section', parent=styles['Heading2'], fontSize=12, textColor=COLOR_PRIMARY, spaceBefore=15, spaceAfter=8, textTransform='uppercase')
-        style_label = ParagraphStyle('Label', parent=styles['Normal'], fontSize=9, textColor=COLOR_GRAY, leading=11)
-        style_value = ParagraphStyle('Value', parent=styles['Normal'], fontSize=10, textColor=COLOR_DARK, leading=12, fontName='Helvetica-Bold')
-        style_normal = ParagraphStyle('NormalText', parent=styles['Normal'], fontSize=10, textColor=COLOR_DARK, leading=14, alignment=TA_JUSTIFY)
+        # 4. Renderização (estilos, logo e rodapé ficam em cache no worker)
+        pdf_bytes = pdf_cache.get(chave, usuario_id, id)
+        if pdf_bytes is None:
+            pdf_bytes = renderizar_pdf(orcamento, user)
+            pdf_cache.put(chave, usuario_id, id, pdf_bytes)
         
-        # --- CABEÇALHO ---
-        logo_path = os.path.join(app.static_folder, 'logo.png')
-        header_content = []
-        
-        if os.path.exists(logo_path):
-            img = Image(logo_path, width=45*mm, height=45*mm, kind='proportional')
-            img.hAlign = 'LEFT'
-            header_content.append(img)
-        else:
-            header_content.append(Paragraph("<b>VALORA</b>", style_section))
-
-        # Tratamento de datas
-        try:
-            data_criacao = orcamento.get('created_at', datetime.now().isoformat())
-            data_fmt = datetime.fromisoformat(data_criacao.replace('Z', '+00:00')).strftime('%d/%m/%Y')
-        except:
-            data_fmt = datetime.now().strftime('%d/%m/%Y')
-
-        info_doc = [
-            Paragraph("PROPOSTA DE HONORÁRIOS", style_title),
-            Paragraph(f"Ref: {orcamento.get('numero', '---')}", style_subtitle),
-            Spacer(1, 5),
-            Paragraph(f"Emitido em: {data_fmt}", ParagraphStyle('Date', parent=styles['Normal'], alignment=TA_RIGHT, fontSize=9, textColor=COLOR_GRAY))
-        ]
-        
-        header_table = Table([[header_content[0] if header_content else "", info_doc]], colWidths=[85*mm, 85*mm])
-        header_table.setStyle(TableStyle([
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-            ('ALIGN', (1,0), (1,0), 'RIGHT'),
-            ('LEFTPADDING', (0,0), (-1,-1), 0),
-            ('RIGHTPADDING', (0,0), (-1,-1), 0),
-        ]))
-        elements.append(header_table)
-        
-        elements.append(Spacer(1, 5*mm))
-        elements.append(Table([['']], colWidths=[170*mm], style=TableStyle([('LINEBELOW', (0,0), (-1,-1), 1, COLOR_PRIMARY)])))
-        elements.append(Spacer(1, 10*mm))
-
-        # --- DADOS DAS PARTES ---
-        prof_text = [
-            [Paragraph("PROFISSIONAL", style_section)],
-            [Paragraph("Nome Completo:", style_label)],
-            [Paragraph(user.get('nome_completo', ''), style_value)],
-            [Spacer(1, 3)],
-            [Paragraph("Registro (CRP):", style_label)],
-            [Paragraph(user.get('numero_crp') or 'Não informado', style_value)],
-            [Spacer(1, 3)],
-            [Paragraph("Contato:", style_label)],
-            [Paragraph(user.get('email', ''), style_value)],
-            [Paragraph(user.get('telefone') or '', style_value)]
-        ]
-
-        client_text = [
-            [Paragraph("CLIENTE", style_section)],
-            [Paragraph("Nome / Responsável:", style_label)],
-            [Paragraph(orcamento.get('nome_cliente', ''), style_value)],
-            [Spacer(1, 3)],
-            [Paragraph("Telefone:", style_label)],
-            [Paragraph(orcamento.get('telefone_cliente') or 'Não informado', style_value)],
-            [Spacer(1, 3)],
-            [Paragraph("Serviço:", style_label)],
-            [Paragraph(orcamento.get('tipo_servico', ''), style_value)]
-        ]
-
-        partes_table = Table([[Table(prof_text, colWidths=[80*mm]), Table(client_text, colWidths=[80*mm])]], colWidths=[85*mm, 85*mm])
-        partes_table.setStyle(TableStyle([
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-            ('LEFTPADDING', (0,0), (-1,-1), 0),
-        ]))
-        elements.append(partes_table)
-        elements.append(Spacer(1, 15*mm))
-
-        # --- TABELA FINANCEIRA ---
-        elements.append(Paragraph("DETALHAMENTO DO INVESTIMENTO", style_section))
-        elements.append(Spacer(1, 3*mm))
-
-        # Valores seguros (float)
-        try:
-            val_base = float(orcamento.get('valor_base', 0))
-            val_ajustado = float(orcamento.get('valor_ajustado', 0))
-            val_total = float(orcamento.get('valor_total', 0))
-            custo_hora = float(orcamento.get('custo_horas_analise', 0))
-        except ValueError:
-            val_base = val_ajustado = val_total = custo_hora = 0.0
-
-        f_data = [['Descrição do Serviço', 'Valor']]
-        f_data.append(['Valor Base Estimado', f"R$ {val_base:.2f}"])
-        f_data.append(['Custo Hora Técnica', f"R$ {custo_hora:.2f}"])
-        
-        if val_ajustado and val_ajustado != val_base:
-             diferenca = val_ajustado - val_base
-             f_data.append(['Ajustes e Especificidades', f"R$ {diferenca:.2f}"])
-
-        t = Table(f_data, colWidths=[130*mm, 40*mm])
-        t.setStyle(TableStyle([
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('TEXTCOLOR', (0,0), (-1,0), COLOR_PRIMARY),
-            ('FONTSIZE', (0,0), (-1,0), 9),
-            ('BOTTOMPADDING', (0,0), (-1,0), 8),
-            ('LINEBELOW', (0,0), (-1,0), 1, COLOR_PRIMARY),
-            ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
-            ('TEXTCOLOR', (0,1), (-1,-1), COLOR_DARK),
-            ('FONTSIZE', (0,1), (-1,-1), 10),
-            ('ALIGN', (1,0), (1,-1), 'RIGHT'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('TOPPADDING', (0,1), (-1,-1), 8),
-            ('BOTTOMPADDING', (0,1), (-1,-1), 8),
-            ('LINEBELOW', (0,1), (-1,-2), 0.5, colors.HexColor('#e5e7eb')),
-        ]))
-        elements.append(t)
-
-        # Total
-        elements.append(Spacer(1, 2*mm))
-        total_row = ['TOTAL DO INVESTIMENTO', f"R$ {val_total:.2f}"]
-        total_table = Table([total_row], colWidths=[130*mm, 40*mm])
-        total_table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,-1), colors.HexColor('#ecfdf5')),
-            ('TEXTCOLOR', (0,0), (-1,-1), COLOR_PRIMARY),
-            ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,-1), 12),
-            ('ALIGN', (1,0), (1,0), 'RIGHT'),
-            ('TOPPADDING', (0,0), (-1,-1), 12),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 12),
-        ]))
-        elements.append(total_table)
-
-        # --- OBSERVAÇÕES ---
-        obs = orcamento.get('observacoes')
-        if obs:
-            elements.append(Spacer(1, 15*mm))
-            elements.append(Paragraph("OBSERVAÇÕES", style_section))
-            elements.append(Paragraph(obs.replace('\n', '<br/>'), style_normal))
-
-        # --- RODAPÉ ---
-        def footer_bg(canvas, doc):
-            canvas.saveState()
-            canvas.setStrokeColor(colors.HexColor('#e5e7eb'))
-            canvas.setLineWidth(0.5)
-            canvas.line(20*mm, 15*mm, 190*mm, 15*mm)
-            canvas.setFont('Helvetica', 8)
-            canvas.setFillColor(colors.HexColor('#9ca3af'))
-            canvas.drawString(20*mm, 10*mm, "VALORA - Soluções em Psicologia e Perícia")
-            canvas.drawRightString(190*mm, 10*mm, f"Página {canvas.getPageNumber()}")
-            canvas.restoreState()
-
-        doc.build(elements, onFirstPage=footer_bg, onLaterPages=footer_bg)
-        buffer.seek(0)
-        
-        return send_file(
-            buffer,
+        resposta = send_file(
+            BytesIO(pdf_bytes),
             mimetype='application/pdf',
             as_attachment=True,
-            download_name=f"Proposta_Valora_{orcamento.get('numero', 'doc')}.pdf"
+            download_name=nome_arquivo(orcamento)
         )
+        return cache_http.condicional(resposta, chave)
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        metricas.registrar_erro()
         return f"Erro ao gerar PDF: {str(e)}", 500
 
+@bp.route('/api/exportar-pdfs', methods=['GET', 'POST'])
+@login_required
+def exportar_pdfs():
+    # Aceita {"ids": [...]} ou {"data_inicio": "AAAA-MM-DD", "data_fim": "AAAA-MM-DD"}
+    params = request.get_json(silent=True) or request.values
+    ids = params.get('ids') or []
+    if isinstance(ids, str):
+        ids = [i for i in ids.split(',') if i.strip()]
+    data_inicio = params.get('data_inicio')
+    data_fim = params.get('data_fim')
+
+    try:
+        ids = [int(i) for i in ids]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'ids inválidos'}), 400
+
+    if not ids and not (data_inicio or data_fim):
+        return jsonify({'error': 'Informe ids ou um intervalo de datas'}), 400
+    if len(ids) > EXPORT_MAX:
+        return jsonify({'error': f'Máximo de {EXPORT_MAX} orçamentos por exportação'}), 400
+
+    try:
+        # Uma única consulta para todos os orçamentos, em paralelo com a do usuário
+        usuario_id = session['user_id']
+        orcamentos, user = dados.em_paralelo(
+            partial(dados.buscar_orcamentos, usuario_id, ids=ids, data_inicio=data_inicio, data_fim=data_fim, limite=EXPORT_MAX),
+            partial(dados.buscar_usuario, usuario_id)
+        )
+
+        if not orcamentos:
+            return jsonify({'error': 'Nenhum orçamento encontrado'}), 404
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+    except Exception as e:
+        metricas.registrar_erro()
+        return jsonify({'error': str(e)}), 500
+
+    return Response(
+        stream_with_context(gerar_zip(orcamentos, user, pdf_cache, session['user_id'])),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f"attachment; filename=Propostas_Valora_{datetime.now().strftime('%Y%m%d%H%M%S')}.zip"}
+    )
+
+@bp.route('/api/pdf-jobs', methods=['POST'])
+@login_required
+def criar_pdf_job():
+    # Renderização fora da requisição: devolve o job para consulta do status
+    data = request.get_json(silent=True) or request.values
+    try:
+        id = int(data.get('orcamento_id'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'orcamento_id inválido'}), 400
+
+    try:
+        usuario_id = session['user_id']
+        orcamento, user = _dados_pdf(usuario_id, id)
+        if not orcamento:
+            return jsonify({'error': 'Orçamento não encontrado'}), 404
+        if not user:
+            return jsonify({'error': 'Usuário não encontrado'}), 404
+
+        chave = chave_pdf(orcamento, user)
+        job = fila_pdf.enviar(
+            usuario_id, orcamento, user, chave, nome_arquivo(orcamento),
+            pdf_bytes=pdf_cache.get(chave, usuario_id, id)
+        )
+    except FilaCheia:
+        return jsonify({'error': 'Fila de PDFs cheia, tente novamente em instantes'}), 503, {'Retry-After': '5'}
+    except Exception as e:
+        metricas.registrar_erro()
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify(_job_json(job)), 202
+
+@bp.route('/api/pdf-jobs/<job_id>')
+@login_required
+def status_pdf_job(job_id):
+    job = fila_pdf.status(job_id, session['user_id'])
+    if not job:
+        return jsonify({'error': 'Job não encontrado ou expirado'}), 404
+    return jsonify(_job_json(job))
+
+@bp.route('/api/pdf-jobs/<job_id>/download')
+@login_required
+def baixar_pdf_job(job_id):
+    arquivo = fila_pdf.arquivo(job_id, session['user_id'])
+    if not arquivo:
+        return jsonify({'error': 'PDF não disponível'}), 404
+    caminho, nome = arquivo
+    return send_file(caminho, mimetype='application/pdf', as_attachment=True, download_name=nome)
+
+def _job_json(job):
+    return {
+        **job,
+        'status_url': url_for('web.status_pdf_job', job_id=job['id']),
+        'download_url': url_for('web.baixar_pdf_job', job_id=job['id']) if job['status'] == 'pronto' else None,
+    }
+
+@bp.route('/api/pdf-cache/stats')
+@login_required
+def pdf_cache_stats():
+    return jsonify(pdf_cache.stats())
+
+@bp.route('/api/metricas/cache')
+@login_required
+def metricas_cache():
+    return jsonify({'linhas': dados.cache.stats(), 'pdf': pdf_cache.stats(), 'fila_pdf': fila_pdf.stats(),
+                    'fragmentos': fragmentos.cache.stats()})
+
+# ============== COMANDOS (flask --app app ...) ==============
+
+@bp.cli.command('importar-orcamentos')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--usuario-id', type=int, required=True, help='Dono dos orçamentos importados')
+@click.option('--lote', type=int, default=LOTE_PADRAO, show_default=True, help='Linhas por insert no Supabase')
+@click.option('--formato', type=click.Choice(['csv', 'jsonl']), help='Padrão: extensão do arquivo')
+def importar_orcamentos_cli(arquivo, usuario_id, lote, formato):
+    """Importa orçamentos de um arquivo CSV ou JSONL."""
+    with open(arquivo, 'rb') as f:
+        relatorio = importar(leitor_para(arquivo, formato)(f), usuario_id, lote=max(1, lote))
+    click.echo(json.dumps(relatorio, ensure_ascii=False, indent=2))
+
+@bp.cli.command('compactar-orcamentos')
+@click.option('--lote', type=int, default=500, show_default=True, help='Linhas lidas e gravadas por vez')
+@click.option('--desde-id', type=int, default=0, show_default=True, help='Retoma a partir deste id (exclusive)')
+@click.option('--limite', type=int, help='Para depois de ler N linhas')
+@click.option('--comprimir/--sem-comprimir', default=None, help='Padrão: ORCAMENTO_COMPRIMIR')
+@click.option('--simular', is_flag=True, help='Só calcula a economia, sem gravar')
+def compactar_orcamentos_cli(lote, desde_id, limite, comprimir, simular):
+    """Converte dados_completos das linhas antigas para o formato compacto."""
+    def progresso(r):
+        click.echo(f"id <= {r['ultimo_id']}: {r['lidos']} lidos, {r['compactados']} compactados, "
+                   f"{r['bytes_economizados']} bytes economizados", err=True)
+    relatorio = compactar_orcamentos(max(1, lote), desde_id, limite, comprimir, simular, progresso)
+    click.echo(json.dumps(relatorio, ensure_ascii=False, indent=2))
+
+# ============== APLICAÇÃO ==============
+
+def create_app():
+    """Cria a aplicação (gunicorn 'app:create_app()', flask --app app)."""
+    app = Flask(__name__)
+    app.secret_key = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
+    
+    # Latências por rota, Supabase, templates, PDF e hash de senha em /metrics
+    metricas.instalar(app, dados.observadores)
+    app.register_blueprint(bp)
+    
+    # Estáticos com hash no nome, gzip/brotli pré-gerados e cache de um ano
+    estaticos.instalar(app)
+    
+    # Bytecode dos templates em disco e cache dos cards do histórico
+    fragmentos.instalar(app)
+    
+    if os.getenv("PDF_PRELOAD", "0") == "1":
+        # Com --preload, o ReportLab e os recursos do PDF ficam na memória do
+        # master e são compartilhados (copy-on-write) pelos workers
+        import pdf_proposta
+        pdf_proposta._recursos()
+    
+    return app
+
 if __name__ == '__main__':
-    app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
+    create_app().run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
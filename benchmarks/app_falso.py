@@ -0,0 +1,22 @@
+"""App com o Supabase falso, para subir sob o gunicorn em bench_servidor.py.
+
+    BENCH_LATENCIA_MS=50 gunicorn -c gunicorn.conf.py benchmarks.app_falso:app
+"""
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import dados  # noqa: E402
+from benchmarks import carga  # noqa: E402
+
+banco = carga._preparar_banco(
+    float(os.getenv('BENCH_LATENCIA_MS', '50')),
+    usuarios=1,
+    orcamentos=int(os.getenv('BENCH_ORCAMENTOS', '2000'))
+)
+# Ids 1..N, que o bench_servidor.py sorteia
+for id_, linha in enumerate(banco.linhas(dados.TABELA_ORCAMENTOS), 1):
+    linha['id'] = id_
+app = carga._app
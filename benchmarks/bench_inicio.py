@@ -0,0 +1,145 @@
+"""Benchmark da inicialização dos workers.
+
+Mede, por worker: tempo de import do app, de create_app(), da primeira
+requisição (GET /login) e do primeiro PDF, além da memória (RSS e a parte
+privada, que não é compartilhada com o master).
+
+Modos:
+  spawn    cada worker é um processo novo que importa tudo (gunicorn sem --preload)
+  preload  o master importa e cria o app uma vez e faz fork dos workers
+           (gunicorn --preload; com PDF_PRELOAD=1 o ReportLab também vem do master)
+
+Uso: python benchmarks/bench_inicio.py [--workers 3] [--modos spawn,preload]
+     PDF_PRELOAD=1 python benchmarks/bench_inicio.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+def _memoria_mb():
+    # RSS total e páginas privadas (sujas ou limpas) do processo atual, em MB
+    valores = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for linha in f:
+                partes = linha.split()
+                if partes[0] in ('Rss:', 'Private_Clean:', 'Private_Dirty:'):
+                    valores[partes[0]] = int(partes[1]) / 1024
+    except OSError:
+        return None, None
+    return round(valores.get('Rss:', 0), 1), round(valores.get('Private_Clean:', 0) + valores.get('Private_Dirty:', 0), 1)
+
+
+def _medir_worker(aplicacao, flask_app, t_import, t_app):
+    import dados
+    from benchmarks.fake_supabase import FakeSupabase
+
+    banco = FakeSupabase()
+    banco.semear(dados.TABELA_USUARIOS, [{'id': 1, 'nome_completo': 'Usuário', 'email': 'u@exemplo.com', 'ativo': True}])
+    banco.semear(dados.TABELA_ORCAMENTOS, [{
+        'id': 1, 'usuario_id': 1, 'numero': 'PER-INICIO', 'nome_cliente': 'Cliente', 'tipo_servico': 'Perícia',
+        'valor_base': 1200.0, 'valor_ajustado': 1200.0, 'valor_total': 1200.0, 'custo_horas_analise': 1200.0,
+    }])
+    dados._cliente = banco
+
+    cliente = flask_app.test_client()
+    with cliente.session_transaction() as s:
+        s['logged_in'] = True
+        s['user_id'] = 1
+
+    inicio = time.perf_counter()
+    cliente.get('/login')
+    t_requisicao = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    resposta = cliente.get('/api/gerar-pdf/1')
+    t_pdf = time.perf_counter() - inicio
+
+    rss, privado = _memoria_mb()
+    return {
+        'pid': os.getpid(),
+        'import_ms': round(t_import * 1000, 1),
+        'create_app_ms': round(t_app * 1000, 1),
+        'primeira_requisicao_ms': round(t_requisicao * 1000, 1),
+        'primeiro_pdf_ms': round(t_pdf * 1000, 1),
+        'pdf_ok': resposta.status_code == 200,
+        'rss_mb': rss,
+        'privado_mb': privado,
+    }
+
+
+def _carregar_app():
+    inicio = time.perf_counter()
+    import app as aplicacao
+    t_import = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    flask_app = aplicacao.create_app()
+    return aplicacao, flask_app, t_import, time.perf_counter() - inicio
+
+
+def _filho():
+    print(json.dumps(_medir_worker(*_carregar_app())))
+
+
+def modo_spawn(workers):
+    processos = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--filho'], stdout=subprocess.PIPE, cwd=RAIZ)
+        for _ in range(workers)
+    ]
+    return [json.loads(p.communicate()[0].decode().strip().splitlines()[-1]) for p in processos]
+
+
+def modo_preload(workers):
+    aplicacao, flask_app, t_import, t_app = _carregar_app()
+    canais = []
+    for _ in range(workers):
+        leitura, escrita = os.pipe()
+        if os.fork() == 0:
+            os.close(leitura)
+            # No fork, o custo de import/create_app já foi pago pelo master
+            resultado = _medir_worker(aplicacao, flask_app, 0.0, 0.0)
+            os.write(escrita, json.dumps(resultado).encode())
+            os._exit(0)
+        os.close(escrita)
+        canais.append(leitura)
+
+    resultados = []
+    for leitura in canais:
+        with os.fdopen(leitura) as f:
+            resultados.append(json.loads(f.read()))
+    for _ in canais:
+        os.wait()
+    print(f"  master: import {t_import * 1000:.0f} ms, create_app {t_app * 1000:.0f} ms")
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--modos', default='spawn,preload')
+    parser.add_argument('--filho', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        _filho()
+        return
+
+    print(f"PDF_PRELOAD={os.getenv('PDF_PRELOAD', '0')}, {args.workers} workers")
+    for modo in args.modos.split(','):
+        print(f"\n[{modo}]")
+        resultados = (modo_spawn if modo == 'spawn' else modo_preload)(args.workers)
+        print(f"  {'pid':>7} {'import':>8} {'create_app':>11} {'1ª req':>8} {'1º PDF':>8} {'RSS MB':>8} {'privado MB':>11}")
+        for r in resultados:
+            print(f"  {r['pid']:>7} {r['import_ms']:>8} {r['create_app_ms']:>11} {r['primeira_requisicao_ms']:>8} "
+                  f"{r['primeiro_pdf_ms']:>8} {r['rss_mb']:>8} {r['privado_mb']:>11}")
+
+
+if __name__ == '__main__':
+    main()
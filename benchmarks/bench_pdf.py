@@ -0,0 +1,68 @@
+"""Benchmark da geração de PDF das propostas (PDFs por segundo).
+
+"antes": recursos remontados a cada PDF, como a rota fazia por requisição
+(getSampleStyleSheet, ParagraphStyles, TableStyles e decodificação da logo),
+com os streams em ASCII85 (padrão do ReportLab).
+"depois": recursos montados uma vez por worker e reaproveitados.
+
+Uso: python benchmarks/bench_pdf.py [-n 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_proposta  # noqa: E402
+from reportlab import rl_config  # noqa: E402
+
+ORCAMENTO = {
+    'numero': 'PER-20250102100000',
+    'created_at': '2025-01-02T10:00:00+00:00',
+    'nome_cliente': 'Maria Oliveira',
+    'telefone_cliente': '(11) 98888-7777',
+    'tipo_servico': 'Perícia Judicial',
+    'valor_base': 1500.0,
+    'valor_ajustado': 1800.0,
+    'valor_total': 1800.0,
+    'custo_horas_analise': 1500.0,
+    'observacoes': 'Pagamento em duas parcelas.\nValidade de 30 dias.',
+}
+
+USER = {
+    'nome_completo': 'Ana Souza',
+    'numero_crp': '06/123456',
+    'email': 'ana@example.com',
+    'telefone': '(11) 99999-0000',
+}
+
+
+def medir(n, frio):
+    inicio = time.perf_counter()
+    for _ in range(n):
+        if frio:
+            pdf_proposta.limpar_cache()
+        pdf_proposta.gerar_pdf_proposta(ORCAMENTO, USER)
+    return n / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=200)
+    args = parser.parse_args()
+
+    # Aquecimento (imports e fontes do ReportLab)
+    pdf_proposta.gerar_pdf_proposta(ORCAMENTO, USER)
+
+    rl_config.useA85 = 1
+    antes = medir(args.n, frio=True)
+    rl_config.useA85 = 0
+    depois = medir(args.n, frio=False)
+    print(f"antes  (setup por PDF):    {antes:8.1f} PDFs/s")
+    print(f"depois (setup por worker): {depois:8.1f} PDFs/s")
+    print(f"ganho: {depois / antes:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
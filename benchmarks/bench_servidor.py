@@ -0,0 +1,168 @@
+"""Vazão com requisições simultâneas: workers sync x gthread no gunicorn.
+
+Sobe o gunicorn de verdade (gunicorn.conf.py) com o app de
+benchmarks/app_falso.py, cujo Supabase falso responde com a latência pedida,
+e dispara requisições HTTP de várias threads.
+
+Cenários:
+  leitura  GET /api/orcamento/<id> e /api/historico (só espera pelo Supabase)
+  misto    leitura + 10% de PDFs sem cache; latências da leitura e do PDF
+           reportadas separadamente
+
+Uso: python benchmarks/bench_servidor.py [--modos sync,gthread] [--latencia-ms 50]
+                                         [--clientes 32] [--requisicoes 600]
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from benchmarks.carga import USUARIO_ID, _percentil  # noqa: E402
+
+
+def _cookie_sessao():
+    app = Flask(__name__)
+    app.secret_key = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
+    serializador = SecureCookieSessionInterface().get_signing_serializer(app)
+    return serializador.dumps({'logged_in': True, 'user_id': USUARIO_ID, 'user_nome': 'Usuário 1'})
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _subir(modo, porta, args):
+    ambiente = {
+        **os.environ,
+        'GUNICORN_WORKER': modo,
+        'WEB_CONCURRENCY': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+        'BENCH_LATENCIA_MS': str(args.latencia_ms),
+        'BENCH_ORCAMENTOS': str(args.orcamentos),
+        'SUPABASE_LENTO_MS': os.getenv('SUPABASE_LENTO_MS', '100000'),
+    }
+    processo = subprocess.Popen(
+        ['gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{porta}', '--log-level', 'warning',
+         'benchmarks.app_falso:app'],
+        cwd=RAIZ, env=ambiente
+    )
+    limite = time.time() + 60
+    while time.time() < limite:
+        try:
+            if httpx.get(f'http://127.0.0.1:{porta}/login', timeout=2).status_code == 200:
+                return processo
+        except httpx.TransportError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError(f'gunicorn ({modo}) não respondeu')
+
+
+def _executar(base, requisicoes, clientes):
+    """Roda (tipo, caminho) em N threads; devolve {tipo: latências}, erros e duração."""
+    local = threading.local()
+    cookie = _cookie_sessao()
+    latencias, erros = {}, []
+    lock = threading.Lock()
+
+    def rodar(item):
+        tipo, caminho = item
+        if not hasattr(local, 'http'):
+            local.http = httpx.Client(base_url=base, cookies={'session': cookie}, timeout=120)
+        inicio = time.perf_counter()
+        resposta = local.http.get(caminho)
+        duracao = time.perf_counter() - inicio
+        with lock:
+            latencias.setdefault(tipo, []).append(duracao)
+            if resposta.status_code >= 400:
+                erros.append(resposta.status_code)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clientes) as pool:
+        list(pool.map(rodar, requisicoes))
+    return latencias, erros, time.perf_counter() - inicio
+
+
+def _leituras(n, ids):
+    return [('leitura', f'/api/orcamento/{random.choice(ids)}' if i % 2 else '/api/historico') for i in range(n)]
+
+
+def cenario_leitura(args, ids):
+    return _leituras(args.requisicoes, ids)
+
+
+def cenario_misto(args, ids):
+    requisicoes = _leituras(args.requisicoes, ids)
+    # ids distintos: cada PDF é renderizado (cache frio)
+    for i, id_ in enumerate(random.sample(ids, args.requisicoes // 10)):
+        requisicoes[i * 10 + 5] = ('pdf', f'/api/gerar-pdf/{id_}')
+    return requisicoes
+
+
+CENARIOS = {'leitura': cenario_leitura, 'misto': cenario_misto}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modos', default='sync,gthread')
+    parser.add_argument('--cenarios', default=','.join(CENARIOS))
+    parser.add_argument('--latencia-ms', type=float, default=50.0)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clientes', type=int, default=32)
+    parser.add_argument('--requisicoes', type=int, default=600)
+    parser.add_argument('--orcamentos', type=int, default=2000)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    random.seed(42)
+    ids = list(range(1, args.orcamentos + 1))
+    resultados = {}
+    print(f"latência simulada {args.latencia_ms:g} ms, {args.workers} workers, {args.clientes} clientes, "
+          f"{os.cpu_count()} CPU(s)")
+    print(f"{'modo':<8} {'cenário':<8} {'tipo':<8} {'req':>5} {'erros':>6} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for modo in args.modos.split(','):
+        porta = _porta_livre()
+        processo = _subir(modo, porta, args)
+        try:
+            for cenario in args.cenarios.split(','):
+                latencias, erros, duracao = _executar(
+                    f'http://127.0.0.1:{porta}', CENARIOS[cenario](args, ids), args.clientes
+                )
+                total = sum(len(v) for v in latencias.values())
+                for tipo, valores in sorted(latencias.items()):
+                    ordenadas = sorted(valores)
+                    r = resultados.setdefault(modo, {}).setdefault(cenario, {})[tipo] = {
+                        'requisicoes': len(valores),
+                        'erros': len(erros),
+                        'vazao': round(total / duracao, 1),
+                        'p50_ms': round(_percentil(ordenadas, 50) * 1000, 1),
+                        'p95_ms': round(_percentil(ordenadas, 95) * 1000, 1),
+                        'p99_ms': round(_percentil(ordenadas, 99) * 1000, 1),
+                    }
+                    print(f"{modo:<8} {cenario:<8} {tipo:<8} {r['requisicoes']:>5} {r['erros']:>6} {r['vazao']:>8} "
+                          f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8}")
+        finally:
+            processo.terminate()
+            processo.wait()
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+
+
+if __name__ == '__main__':
+    main()
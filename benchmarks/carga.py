@@ -0,0 +1,276 @@
+"""Testes de carga das rotas do app contra o Supabase falso em memória.
+
+Cenários (cada um com N requisições e C threads simultâneas):
+  login     tempestade de POST /login com usuários distintos
+  historico navegação no histórico com 5 mil orçamentos (página, rolagem e busca)
+  salvar    rajadas de POST /api/salvar-orcamento
+  pdf       GET /api/gerar-pdf/<id> em orçamentos distintos (cache frio)
+
+Antes de medir, cada cenário roda um aquecimento fora da contagem (imports
+preguiçosos como o ReportLab, subida do pool de PDFs, templates, conexões).
+Reporta vazão e latências p50/p95/p99 e compara com benchmarks/baseline.json:
+sai com código 1 se a vazão cair ou o p95 subir além da tolerância (o p95 tem
+ainda uma margem absoluta, já que alguns ms de ruído são uma fração grande de
+um p95 curto). A baseline depende da máquina; regrave com --salvar-baseline
+ao trocar de ambiente.
+
+Uso:
+    python benchmarks/carga.py [--cenarios login,historico] [--latencia-ms 20]
+                               [--concorrencia 8] [--escala 1.0] [--aquecimento 20]
+                               [--tolerancia 0.25] [--margem-ms 20] [--salvar-baseline]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ.setdefault('PDF_JOBS_DIR', tempfile.mkdtemp(prefix='lorena-carga-'))
+
+import app as aplicacao  # noqa: E402
+import dados  # noqa: E402
+from benchmarks.fake_supabase import FakeSupabase  # noqa: E402
+from orcamentos import montar_orcamento  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+_app = aplicacao.create_app()
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+USUARIO_ID = 1
+SENHA = 'senha-de-teste'
+TIPOS = ('Perícia Judicial', 'Avaliação Psicológica', 'Laudo Técnico', 'Parecer')
+
+PAYLOAD = {
+    'nome_cliente': 'Cliente Carga',
+    'tipo_servico': 'Perícia Judicial',
+    'taxa_horaria': 150,
+    'horas_analise': 8,
+    'grau_urgencia': 10,
+    'grau_complexidade': 20,
+}
+
+
+# ============== PREPARAÇÃO ==============
+
+def _preparar_banco(latencia_ms, usuarios, orcamentos):
+    banco = FakeSupabase(latencia_ms=latencia_ms)
+    # Um único hash para todos: o custo medido é o da verificação no login
+    senha_hash = generate_password_hash(SENHA)
+    banco.semear(dados.TABELA_USUARIOS, [
+        {'id': i, 'nome_completo': f'Usuário {i}', 'email': f'usuario{i}@exemplo.com',
+         'senha_hash': senha_hash, 'numero_crp': '06/000000', 'telefone': '(11) 90000-0000', 'ativo': True}
+        for i in range(1, usuarios + 1)
+    ])
+    banco.semear(dados.TABELA_CUSTOS, [{
+        'usuario_id': USUARIO_ID, 'aluguel_consultorio': 1000.0, 'internet_telefonia': 200.0,
+        'ferramentas_software': 150.0, 'anuidade_crp': 100.0, 'funcionarios_salarios': 0.0,
+        'outros_custos': 0.0, 'horas_trabalhadas_mes': 160,
+    }])
+    linhas = []
+    for i in range(orcamentos):
+        linha = montar_orcamento(
+            {**PAYLOAD, 'nome_cliente': f'Cliente {i:05d}', 'tipo_servico': TIPOS[i % len(TIPOS)],
+             'horas_analise': 2 + i % 20},
+            USUARIO_ID, numero=f'PER-CARGA-{i:06d}'
+        )
+        linha['created_at'] = f'2025-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:00.{i:06d}+00:00'
+        linhas.append(linha)
+    banco.semear(dados.TABELA_ORCAMENTOS, linhas)
+    dados._cliente = banco
+    dados.cache._cache.clear()
+    return banco
+
+
+def _cliente_logado():
+    cliente = _app.test_client()
+    with cliente.session_transaction() as s:
+        s['logged_in'] = True
+        s['user_id'] = USUARIO_ID
+        s['user_nome'] = 'Usuário 1'
+    return cliente
+
+
+# ============== EXECUÇÃO ==============
+
+def _medir(args, aquecimento, requisicoes, logado=True):
+    """Roda o aquecimento (descartado) e depois as requisições medidas."""
+    if aquecimento:
+        _executar(aquecimento, args.concorrencia, logado)
+    return _executar(requisicoes, args.concorrencia, logado)
+
+
+def _executar(requisicoes, concorrencia, logado=True):
+    """Roda as funções (cliente -> resposta) em C threads; devolve latências e erros."""
+    local = threading.local()
+    latencias, erros = [], []
+
+    def rodar(requisicao):
+        if not hasattr(local, 'cliente'):
+            local.cliente = _cliente_logado() if logado else _app.test_client()
+        inicio = time.perf_counter()
+        resposta = requisicao(local.cliente)
+        duracao = time.perf_counter() - inicio
+        if resposta.status_code >= 400:
+            erros.append(resposta.status_code)
+        return duracao
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as pool:
+        latencias = list(pool.map(rodar, requisicoes))
+    return latencias, erros, time.perf_counter() - inicio
+
+
+def _percentil(ordenadas, p):
+    if not ordenadas:
+        return 0.0
+    indice = min(len(ordenadas) - 1, max(0, round(p / 100 * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+
+def _resumo(latencias, erros, duracao):
+    ordenadas = sorted(latencias)
+    return {
+        'requisicoes': len(latencias),
+        'erros': len(erros),
+        'vazao': round(len(latencias) / duracao, 1),
+        'p50_ms': round(_percentil(ordenadas, 50) * 1000, 2),
+        'p95_ms': round(_percentil(ordenadas, 95) * 1000, 2),
+        'p99_ms': round(_percentil(ordenadas, 99) * 1000, 2),
+    }
+
+
+# ============== CENÁRIOS ==============
+
+def cenario_login(args):
+    n = int(200 * args.escala)
+    _preparar_banco(args.latencia_ms, usuarios=n + args.aquecimento, orcamentos=0)
+
+    def login(i):
+        return lambda c: c.post('/login', data={'email': f'usuario{i}@exemplo.com', 'senha': SENHA})
+    logins = [login(1 + i) for i in range(n + args.aquecimento)]
+    return _medir(args, logins[n:], logins[:n], logado=False)
+
+
+def cenario_historico(args):
+    _preparar_banco(args.latencia_ms, usuarios=1, orcamentos=5000)
+    n = int(300 * args.escala)
+
+    def rolagem(c):
+        # Primeira página + duas páginas seguintes pelo cursor
+        resposta = c.get('/api/historico')
+        for _ in range(2):
+            cursor = resposta.get_json().get('proximo_cursor')
+            if not cursor:
+                break
+            resposta = c.get(f'/api/historico?cursor={cursor}')
+        return resposta
+
+    tipos = [lambda c: c.get('/historico'), rolagem, lambda c: c.get('/historico?q=cliente 04')]
+    aquecimento = [tipos[i % len(tipos)] for i in range(args.aquecimento)]
+    return _medir(args, aquecimento, [tipos[i % len(tipos)] for i in range(n)])
+
+
+def cenario_salvar(args):
+    _preparar_banco(args.latencia_ms, usuarios=1, orcamentos=0)
+    n = int(500 * args.escala)
+    salvar = lambda c: c.post('/api/salvar-orcamento', json=dict(PAYLOAD))  # noqa: E731
+    return _medir(args, [salvar] * args.aquecimento, [salvar] * n)
+
+
+def cenario_pdf(args):
+    n = int(100 * args.escala)
+    # Orçamentos extras para o aquecimento: os medidos continuam com cache frio
+    banco = _preparar_banco(args.latencia_ms, usuarios=1, orcamentos=n + args.aquecimento)
+    aplicacao.pdf_cache._itens.clear()
+    aplicacao.pdf_cache._total = 0
+    ids = [r['id'] for r in banco.linhas(dados.TABELA_ORCAMENTOS)]
+
+    def pdf(id):
+        return lambda c: c.get(f'/api/gerar-pdf/{id}')
+    pdfs = [pdf(id) for id in ids]
+    return _medir(args, pdfs[n:], pdfs[:n])
+
+
+CENARIOS = {
+    'login': cenario_login,
+    'historico': cenario_historico,
+    'salvar': cenario_salvar,
+    'pdf': cenario_pdf,
+}
+
+
+# ============== BASELINE ==============
+
+def _comparar(resultados, baseline, tolerancia, margem_ms):
+    regressoes = []
+    for nome, atual in resultados.items():
+        anterior = baseline.get(nome)
+        if not anterior:
+            continue
+        if atual['vazao'] < anterior['vazao'] * (1 - tolerancia):
+            regressoes.append(f"{nome}: vazão {atual['vazao']}/s < {anterior['vazao']}/s na baseline")
+        if atual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia) + margem_ms:
+            regressoes.append(f"{nome}: p95 {atual['p95_ms']} ms > {anterior['p95_ms']} ms na baseline")
+        if atual['erros'] > anterior['erros']:
+            regressoes.append(f"{nome}: {atual['erros']} erro(s)")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cenarios', default=','.join(CENARIOS))
+    parser.add_argument('--latencia-ms', type=float, default=20.0)
+    parser.add_argument('--concorrencia', type=int, default=8)
+    parser.add_argument('--escala', type=float, default=1.0, help='multiplica o número de requisições')
+    parser.add_argument('--aquecimento', type=int, default=20, help='requisições descartadas antes de medir')
+    parser.add_argument('--tolerancia', type=float, default=0.25)
+    parser.add_argument('--margem-ms', type=float, default=20.0, help='folga absoluta somada ao limite do p95')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--salvar-baseline', action='store_true')
+    args = parser.parse_args()
+
+    resultados = {}
+    print(f"latência simulada {args.latencia_ms:g} ms, {args.concorrencia} threads")
+    print(f"{'cenário':<10} {'req':>6} {'erros':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for nome in [c.strip() for c in args.cenarios.split(',') if c.strip()]:
+        r = resultados[nome] = _resumo(*CENARIOS[nome](args))
+        print(f"{nome:<10} {r['requisicoes']:>6} {r['erros']:>6} {r['vazao']:>9} "
+              f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+
+    configuracao = {'latencia_ms': args.latencia_ms, 'concorrencia': args.concorrencia, 'escala': args.escala,
+                    'aquecimento': args.aquecimento}
+    if args.salvar_baseline:
+        anterior = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                anterior = json.load(f).get('cenarios', {})
+        with open(args.baseline, 'w') as f:
+            json.dump({'configuracao': configuracao, 'cenarios': {**anterior, **resultados}}, f, indent=2)
+            f.write('\n')
+        print(f"baseline gravada em {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("sem baseline para comparar (use --salvar-baseline)")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('configuracao') != configuracao:
+        print(f"aviso: baseline gravada com {baseline.get('configuracao')}, execução atual com {configuracao}")
+    regressoes = _comparar(resultados, baseline.get('cenarios', {}), args.tolerancia, args.margem_ms)
+    if regressoes:
+        print("REGRESSÕES:")
+        for r in regressoes:
+            print(f"  {r}")
+        sys.exit(1)
+    print(f"sem regressões (tolerância {args.tolerancia:.0%} + {args.margem_ms:g} ms no p95)")
+
+
+if __name__ == '__main__':
+    main()
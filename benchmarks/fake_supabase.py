@@ -0,0 +1,338 @@
+"""Cliente Supabase falso, em memória, para benchmarks e testes de carga.
+
+Implementa o subconjunto do query builder do postgrest-py usado pelo app
+(select/insert/update/delete, filtros eq/in_/gte/lte/lt/gt/ilike/or_,
+order e limit) sobre dicts em memória, com latência configurável por
+chamada para simular a ida e volta ao Supabase. Funções do banco chamadas
+por rpc() são reimplementadas em Python (ver FakeSupabase.procedimentos).
+
+Uso:
+    import dados
+    from benchmarks.fake_supabase import FakeSupabase
+    dados._cliente = FakeSupabase(latencia_ms=20)
+"""
+import copy
+import itertools
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+
+def _comparavel(valor):
+    return valor if isinstance(valor, (int, float)) else str(valor)
+
+
+def _like_para_regex(padrao):
+    # % e * são curingas; \ escapa o caractere seguinte
+    saida, i = [], 0
+    while i < len(padrao):
+        ch = padrao[i]
+        if ch == '\\' and i + 1 < len(padrao):
+            saida.append(re.escape(padrao[i + 1]))
+            i += 2
+            continue
+        saida.append('.*' if ch in '%*' else re.escape(ch))
+        i += 1
+    return ''.join(saida)
+
+
+def _cond(coluna, op, valor):
+    def num(v):
+        try:
+            return float(v)
+        except (TypeError, ValueError):
+            return v
+
+    if op == 'eq':
+        return lambda r: r.get(coluna) == valor or str(r.get(coluna)) == str(valor)
+    if op == 'neq':
+        return lambda r: r.get(coluna) != valor
+    if op in ('lt', 'lte', 'gt', 'gte'):
+        comparar = {
+            'lt': lambda a, b: a < b, 'lte': lambda a, b: a <= b,
+            'gt': lambda a, b: a > b, 'gte': lambda a, b: a >= b,
+        }[op]
+
+        def filtro(r):
+            atual = r.get(coluna)
+            if atual is None:
+                return False
+            if isinstance(atual, (int, float)):
+                return comparar(atual, num(valor))
+            return comparar(str(atual), str(valor))
+        return filtro
+    if op == 'ilike':
+        regex = re.compile(f'^{_like_para_regex(str(valor).lower())}$', re.S)
+        return lambda r: bool(regex.match(str(r.get(coluna) or '').lower()))
+    if op == 'in':
+        valores = set(str(v) for v in valor)
+        return lambda r: str(r.get(coluna)) in valores
+    raise NotImplementedError(op)
+
+
+def _dividir(expr):
+    # Divide por vírgulas de primeiro nível (fora de parênteses e aspas)
+    partes, nivel, aspas, atual = [], 0, False, ''
+    for ch in expr:
+        if ch == '"':
+            aspas = not aspas
+        elif not aspas and ch == '(':
+            nivel += 1
+        elif not aspas and ch == ')':
+            nivel -= 1
+        if ch == ',' and nivel == 0 and not aspas:
+            partes.append(atual)
+            atual = ''
+        else:
+            atual += ch
+    partes.append(atual)
+    return partes
+
+
+def _parse_logico(expr):
+    expr = expr.strip()
+    for operador, combinar in (('and(', all), ('or(', any)):
+        if expr.startswith(operador) and expr.endswith(')'):
+            filhos = [_parse_logico(p) for p in _dividir(expr[len(operador):-1])]
+            return lambda r, filhos=filhos, combinar=combinar: combinar(f(r) for f in filhos)
+    coluna, op, valor = expr.split('.', 2)
+    if valor.startswith('"') and valor.endswith('"'):
+        valor = valor[1:-1]
+    return _cond(coluna, op, valor)
+
+
+class _Query:
+    def __init__(self, banco, nome):
+        self._banco = banco
+        self._nome = nome
+        self._op = 'select'
+        self._filtros = []
+        self._colunas = '*'
+        self._payload = None
+        self._ordem = []
+        self._limite = None
+        self._conflito = None
+
+    # --- operações ---
+    def select(self, colunas='*', **kwargs):
+        self._colunas = colunas
+        return self
+
+    def insert(self, payload, **kwargs):
+        self._op, self._payload = 'insert', payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, **kwargs):
+        self._op, self._payload, self._conflito = 'upsert', payload, on_conflict
+        return self
+
+    def update(self, payload, **kwargs):
+        self._op, self._payload = 'update', payload
+        return self
+
+    def delete(self, **kwargs):
+        self._op = 'delete'
+        return self
+
+    # --- filtros ---
+    def eq(self, coluna, valor):
+        self._filtros.append(_cond(coluna, 'eq', valor))
+        return self
+
+    def neq(self, coluna, valor):
+        self._filtros.append(_cond(coluna, 'neq', valor))
+        return self
+
+    def in_(self, coluna, valores):
+        self._filtros.append(_cond(coluna, 'in', list(valores)))
+        return self
+
+    def gt(self, coluna, valor):
+        self._filtros.append(_cond(coluna, 'gt', valor))
+        return self
+
+    def gte(self, coluna, valor):
+        self._filtros.append(_cond(coluna, 'gte', valor))
+        return self
+
+    def lt(self, coluna, valor):
+        self._filtros.append(_cond(coluna, 'lt', valor))
+        return self
+
+    def lte(self, coluna, valor):
+        self._filtros.append(_cond(coluna, 'lte', valor))
+        return self
+
+    def ilike(self, coluna, padrao):
+        self._filtros.append(_cond(coluna, 'ilike', padrao))
+        return self
+
+    def or_(self, expr):
+        self._filtros.append(_parse_logico(f'or({expr})'))
+        return self
+
+    def order(self, coluna, desc=False, **kwargs):
+        self._ordem.append((coluna, desc))
+        return self
+
+    def limit(self, n, **kwargs):
+        self._limite = n
+        return self
+
+    # --- execução ---
+    def _projetar(self, linhas):
+        if self._colunas.strip() == '*':
+            return linhas
+        colunas = [c.strip() for c in self._colunas.split(',')]
+        return [{c: r.get(c) for c in colunas} for r in linhas]
+
+    def execute(self):
+        return self._banco.executar(self)
+
+
+class _Rpc:
+    def __init__(self, banco, nome, params):
+        self._banco = banco
+        self._nome = nome
+        self._params = params
+
+    def execute(self):
+        return self._banco.chamar(self._nome, self._params)
+
+
+def _acumular_estatisticas(banco, params):
+    # Equivalente a lorena_acumular_estatisticas (sql/002_estatisticas.sql)
+    tabela = banco.linhas('lorena-estatisticas_mensais')
+    chaves = ('usuario_id', 'mes', 'tipo_servico')
+    for item in params['p_itens']:
+        linha = next((r for r in tabela if all(r[c] == item[c] for c in chaves)), None)
+        if linha is None:
+            linha = {c: item[c] for c in chaves}
+            linha.update(quantidade=0, faixas_ajuste={})
+            tabela.append(linha)
+        for campo, valor in item.items():
+            if campo.startswith('soma_') or campo == 'quantidade':
+                linha[campo] = linha.get(campo, 0) + valor
+        for faixa, qtd in item.get('faixas_ajuste', {}).items():
+            linha['faixas_ajuste'][faixa] = linha['faixas_ajuste'].get(faixa, 0) + qtd
+            if not linha['faixas_ajuste'][faixa]:
+                del linha['faixas_ajuste'][faixa]
+        if linha['quantidade'] <= 0:
+            tabela.remove(linha)
+    return None
+
+
+def _gravar_dados_completos(banco, params):
+    # Equivalente a lorena_gravar_dados_completos (sql/003_dados_compactos.sql)
+    novos = {item['id']: item['dados_completos'] for item in params['p_itens']}
+    alteradas = 0
+    for linha in banco.linhas('lorena-orcamentos'):
+        if linha['id'] in novos and str(linha.get('dados_completos') or '').startswith('{'):
+            linha['dados_completos'] = novos[linha['id']]
+            alteradas += 1
+    return alteradas
+
+
+CAMPOS_ATUALIZAR = ('valor_base', 'horas_analise', 'grau_urgencia', 'grau_especificidade', 'grau_complexidade',
+                    'ajustes', 'valor_ajustado', 'taxa_horaria', 'custo_horas_analise', 'subtotal_fixo',
+                    'valor_total', 'dados_completos')
+
+
+def _atualizar_orcamentos(banco, params):
+    # Equivalente a lorena_atualizar_orcamentos (sql/004_operacoes_lote.sql)
+    itens = {item['id']: item for item in params['p_itens']}
+    atualizadas = []
+    for linha in banco.linhas('lorena-orcamentos'):
+        item = itens.get(linha['id'])
+        if item is not None and linha['usuario_id'] == params['p_usuario_id']:
+            linha.update({campo: item.get(campo) for campo in CAMPOS_ATUALIZAR})
+            atualizadas.append(copy.deepcopy(linha))
+    return atualizadas
+
+
+class FakeSupabase:
+    def __init__(self, latencia_ms=0.0):
+        self.latencia = latencia_ms / 1000.0
+        self.tabelas = {}
+        self.chamadas = 0
+        self.procedimentos = {
+            'lorena_acumular_estatisticas': _acumular_estatisticas,
+            'lorena_gravar_dados_completos': _gravar_dados_completos,
+            'lorena_atualizar_orcamentos': _atualizar_orcamentos,
+        }
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def table(self, nome):
+        return _Query(self, nome)
+
+    from_ = table
+
+    def rpc(self, nome, params=None):
+        return _Rpc(self, nome, params or {})
+
+    def chamar(self, nome, params):
+        if self.latencia:
+            time.sleep(self.latencia)
+        with self._lock:
+            self.chamadas += 1
+            resultado = self.procedimentos[nome](self, copy.deepcopy(params))
+            return SimpleNamespace(data=resultado, count=None)
+
+    def linhas(self, nome):
+        return self.tabelas.setdefault(nome, [])
+
+    def semear(self, nome, linhas):
+        """Insere linhas diretamente, sem latência (preparação dos cenários)."""
+        with self._lock:
+            for linha in linhas:
+                self._novo(nome, linha)
+
+    def _novo(self, nome, dados):
+        linha = copy.deepcopy(dados)
+        linha.setdefault('id', next(self._seq))
+        linha.setdefault('created_at', datetime.now(timezone.utc).isoformat())
+        self.linhas(nome).append(linha)
+        return linha
+
+    def executar(self, q):
+        if self.latencia:
+            time.sleep(self.latencia)
+        with self._lock:
+            self.chamadas += 1
+            tabela = self.linhas(q._nome)
+
+            if q._op in ('insert', 'upsert'):
+                itens = q._payload if isinstance(q._payload, list) else [q._payload]
+                saida = []
+                for item in itens:
+                    existente = None
+                    if q._op == 'upsert' and q._conflito:
+                        chaves = [c.strip() for c in q._conflito.split(',')]
+                        existente = next((r for r in tabela if all(r.get(c) == item.get(c) for c in chaves)), None)
+                    if existente is not None:
+                        existente.update(copy.deepcopy(item))
+                        saida.append(copy.deepcopy(existente))
+                    else:
+                        saida.append(copy.deepcopy(self._novo(q._nome, item)))
+                return SimpleNamespace(data=saida, count=None)
+
+            encontradas = [r for r in tabela if all(f(r) for f in q._filtros)]
+
+            if q._op == 'update':
+                for r in encontradas:
+                    r.update(copy.deepcopy(q._payload))
+                return SimpleNamespace(data=copy.deepcopy(encontradas), count=None)
+
+            if q._op == 'delete':
+                ids = set(id(r) for r in encontradas)
+                tabela[:] = [r for r in tabela if id(r) not in ids]
+                return SimpleNamespace(data=copy.deepcopy(encontradas), count=None)
+
+            for coluna, desc in reversed(q._ordem):
+                encontradas.sort(key=lambda r: _comparavel(r.get(coluna)), reverse=desc)
+            if q._limite is not None:
+                encontradas = encontradas[:q._limite]
+            return SimpleNamespace(data=copy.deepcopy(q._projetar(encontradas)), count=None)
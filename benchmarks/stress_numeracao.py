@@ -0,0 +1,81 @@
+"""Teste de estresse da numeração dos orçamentos.
+
+Simula vários workers do gunicorn (processos criados por fork depois de
+importar o app, como no --preload), cada um com várias threads salvando
+orçamentos pelo /api/salvar-orcamento ao mesmo tempo. Falha (código 1) se
+algum número se repetir.
+
+Uso: python benchmarks/stress_numeracao.py [--processos 4] [--threads 8] [--por-thread 250]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import app as aplicacao  # noqa: E402
+import dados  # noqa: E402
+from benchmarks.fake_supabase import FakeSupabase  # noqa: E402
+
+_app = aplicacao.create_app()
+
+PAYLOAD = {
+    'nome_cliente': 'Cliente Estresse',
+    'tipo_servico': 'Perícia',
+    'taxa_horaria': 150,
+    'horas_analise': 8,
+    'grau_urgencia': 10,
+}
+
+
+def _salvar(quantidade):
+    cliente = _app.test_client()
+    with cliente.session_transaction() as s:
+        s['logged_in'] = True
+        s['user_id'] = 1
+    numeros = []
+    for _ in range(quantidade):
+        resposta = cliente.post('/api/salvar-orcamento', json=dict(PAYLOAD))
+        numeros.append(resposta.get_json()['numero'])
+    return numeros
+
+
+def _worker(args):
+    threads, por_thread = args
+    dados._cliente = FakeSupabase()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return [n for lote in pool.map(_salvar, [por_thread] * threads) for n in lote]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processos', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--por-thread', type=int, default=250)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(args.processos) as pool:
+        resultados = pool.map(_worker, [(args.threads, args.por_thread)] * args.processos)
+    duracao = time.perf_counter() - inicio
+
+    numeros = [n for lote in resultados for n in lote]
+    repetidos = {n: c for n, c in Counter(numeros).items() if c > 1}
+    segundos = len({n[:18] for n in numeros})
+
+    print(f"{len(numeros)} orçamentos em {duracao:.2f}s ({len(numeros) / duracao:.0f}/s), "
+          f"{segundos} segundo(s) distintos no prefixo")
+    print(f"duplicados: {len(repetidos)}")
+    if repetidos:
+        for numero, vezes in list(repetidos.items())[:10]:
+            print(f"  {numero} x{vezes}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
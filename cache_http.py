@@ -0,0 +1,37 @@
+import hashlib
+import json
+
+from flask import Response, request
+
+# Validador HTTP (ETag forte) e 304 para as respostas por usuário (orçamento e
+# PDF). Ficam "private, no-cache": o navegador guarda a resposta, mas revalida
+# a cada uso, e recebe 304 sem corpo se nada mudou. Sem Last-Modified: a linha
+# do orçamento não tem updated_at, e created_at não muda numa reprecificação.
+
+
+def etag_json(dados):
+    bruto = json.dumps(dados, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(bruto.encode('utf-8')).hexdigest()
+
+
+def _validadores(resposta, etag):
+    resposta.set_etag(etag)
+    resposta.cache_control.private = True
+    resposta.cache_control.no_cache = True
+    return resposta
+
+
+def ainda_valido(etag):
+    """True se a cópia do navegador (If-None-Match) ainda vale."""
+    return bool(request.if_none_match) and request.if_none_match.contains(etag)
+
+
+def nao_modificado(etag):
+    return _validadores(Response(status=304), etag)
+
+
+def condicional(resposta, etag):
+    """Aplica o validador e troca a resposta por 304 se o navegador já a tem."""
+    if request.method in ('GET', 'HEAD') and ainda_valido(etag):
+        return nao_modificado(etag)
+    return _validadores(resposta, etag)
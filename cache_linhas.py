@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+
+from cachetools import TTLCache
+
+# Cache em processo (TTL + tamanho máximo) das linhas por usuário que só mudam
+# quando o próprio usuário envia um formulário (perfil e custos fixos).
+#
+# Com `diretorio` definido, cada invalidação também grava um marcador em um
+# diretório compartilhado; os outros workers do gunicorn comparam o marcador
+# com o momento em que guardaram a linha e descartam a cópia antiga.
+
+
+class CacheLinhas:
+    def __init__(self, maxsize=1024, ttl=300, diretorio=None):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.diretorio = diretorio
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    def _marcador(self, chave):
+        return os.path.join(self.diretorio, '_'.join(str(p) for p in chave))
+
+    def _invalidado_depois(self, chave, guardado_em):
+        try:
+            return os.stat(self._marcador(chave)).st_mtime_ns >= guardado_em
+        except OSError:
+            return False
+
+    def get(self, chave):
+        with self._lock:
+            item = self._cache.get(chave)
+        if item is not None and self.diretorio and self._invalidado_depois(chave, item[0]):
+            with self._lock:
+                self._cache.pop(chave, None)
+            item = None
+
+        with self._lock:
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return item[1]
+
+    def set(self, chave, valor):
+        with self._lock:
+            self._cache[chave] = (time.time_ns(), valor)
+
+    def invalidar(self, chave):
+        with self._lock:
+            self._cache.pop(chave, None)
+            self.invalidacoes += 1
+        if self.diretorio:
+            try:
+                with open(self._marcador(chave), 'w'):
+                    pass
+                os.utime(self._marcador(chave), ns=(time.time_ns(), time.time_ns()))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'invalidacoes': self.invalidacoes,
+                'itens': len(self._cache),
+                'max_itens': self._cache.maxsize,
+                'ttl': self._cache.ttl,
+                'diretorio': self.diretorio,
+            }
@@ -0,0 +1,64 @@
+import json
+import zlib
+
+import dados
+from orcamentos import compactar_dados, compacto, ler_dados_completos
+
+# Migração de dados_completos do formato antigo (payload inteiro repetido) para
+# o compacto (só os campos sem coluna). Percorre a tabela por id em lotes; cada
+# lote é gravado em um único update, e linhas já compactas são ignoradas, então
+# a migração pode ser interrompida e retomada (--desde-id ou simplesmente de novo).
+
+LOTE_PADRAO = 500
+
+
+def _tamanho(valor):
+    if valor is None:
+        return 0
+    if not isinstance(valor, str):
+        valor = json.dumps(valor, ensure_ascii=False)
+    return len(valor.encode('utf-8'))
+
+
+def compactar(lote=LOTE_PADRAO, desde_id=0, limite=None, comprimir=None, simular=False, progresso=None):
+    """Converte as linhas com id > desde_id; devolve o relatório com os bytes economizados."""
+    relatorio = {
+        'lidos': 0, 'compactados': 0, 'ja_compactos': 0, 'com_erro': 0,
+        'bytes_antes': 0, 'bytes_depois': 0, 'bytes_economizados': 0,
+        'ultimo_id': desde_id, 'simulacao': simular,
+    }
+
+    while limite is None or relatorio['lidos'] < limite:
+        tamanho_lote = lote if limite is None else min(lote, limite - relatorio['lidos'])
+        linhas = dados.buscar_dados_completos(relatorio['ultimo_id'], tamanho_lote)
+        if not linhas:
+            break
+
+        itens = []
+        for linha in linhas:
+            valor = linha.get('dados_completos')
+            if compacto(valor):
+                relatorio['ja_compactos'] += 1
+                continue
+            try:
+                novo = compactar_dados(ler_dados_completos(valor, estrito=True), comprimir=comprimir)
+            except (ValueError, TypeError, zlib.error):
+                # JSON inválido ou que não é objeto (lista, número...): mantém a linha como está
+                relatorio['com_erro'] += 1
+                continue
+            itens.append({'id': linha['id'], 'dados_completos': novo})
+            relatorio['bytes_antes'] += _tamanho(valor)
+            relatorio['bytes_depois'] += _tamanho(novo)
+
+        if itens and not simular:
+            dados.gravar_dados_completos(itens)
+        relatorio['compactados'] += len(itens)
+        relatorio['lidos'] += len(linhas)
+        relatorio['ultimo_id'] = linhas[-1]['id']
+        relatorio['bytes_economizados'] = relatorio['bytes_antes'] - relatorio['bytes_depois']
+        if progresso:
+            progresso(relatorio)
+        if len(linhas) < tamanho_lote:
+            break
+
+    return relatorio
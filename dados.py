@@ -0,0 +1,295 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from postgrest.types import ReturnMethod
+from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
+
+from cache_linhas import CacheLinhas
+
+# Camada de acesso a dados sobre as tabelas do Supabase.
+# Um único cliente HTTP/2 com keep-alive por worker, timeout e tentativas
+# configuráveis por chamada e tempo de cada consulta registrado.
+
+logger = logging.getLogger('dados')
+
+TIMEOUT_PADRAO = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+TENTATIVAS_LEITURA = int(os.getenv("SUPABASE_TENTATIVAS", "2"))
+LENTO_MS = float(os.getenv("SUPABASE_LENTO_MS", "500"))
+
+TABELA_USUARIOS = 'lorena-usuarios'
+TABELA_CUSTOS = 'lorena-custos_fixos'
+TABELA_ORCAMENTOS = 'lorena-orcamentos'
+TABELA_ESTATISTICAS = 'lorena-estatisticas_mensais'
+
+_cliente = None
+_cliente_lock = threading.Lock()
+_executor = None
+
+# Timeout da chamada em andamento, aplicado pelo hook do httpx
+_timeout_atual = contextvars.ContextVar('timeout_supabase', default=None)
+
+# Callbacks (nome, segundos, ok) chamados a cada consulta
+observadores = []
+
+# Perfil e custos fixos por usuário (write-through nas rotas de formulário)
+cache = CacheLinhas(
+    maxsize=int(os.getenv("CACHE_MAX_ITENS", "1024")),
+    ttl=float(os.getenv("CACHE_TTL", "300")),
+    diretorio=os.getenv("CACHE_INVALIDACAO_DIR") or None
+)
+
+
+def _aplicar_timeout(request):
+    timeout = _timeout_atual.get()
+    if timeout is not None:
+        request.extensions['timeout'] = httpx.Timeout(timeout).as_dict()
+
+
+def criar_cliente(url=None, key=None):
+    conexoes = int(os.getenv("SUPABASE_POOL", "20"))
+    http = httpx.Client(
+        http2=True,
+        follow_redirects=True,
+        timeout=httpx.Timeout(TIMEOUT_PADRAO),
+        limits=httpx.Limits(max_connections=conexoes, max_keepalive_connections=conexoes, keepalive_expiry=60),
+        event_hooks={'request': [_aplicar_timeout]},
+    )
+    return create_client(
+        url or os.getenv("SUPABASE_URL"),
+        key or os.getenv("SUPABASE_KEY"),
+        options=SyncClientOptions(httpx_client=http, postgrest_client_timeout=TIMEOUT_PADRAO)
+    )
+
+
+def cliente() -> Client:
+    global _cliente
+    if _cliente is None:
+        with _cliente_lock:
+            if _cliente is None:
+                novo = criar_cliente()
+                # O cliente postgrest é criado na primeira leitura da propriedade;
+                # criar aqui, sob o lock, evita a corrida entre threads do worker
+                novo.postgrest
+                _cliente = novo
+    return _cliente
+
+
+def tabela(nome):
+    return cliente().table(nome)
+
+
+def executar(query, nome, timeout=None, tentativas=1):
+    """Executa a query medindo o tempo; repete apenas em falhas de transporte."""
+    token = _timeout_atual.set(timeout or TIMEOUT_PADRAO)
+    try:
+        for tentativa in range(1, tentativas + 1):
+            inicio = time.perf_counter()
+            ok = False
+            try:
+                resposta = query.execute()
+                ok = True
+                return resposta
+            except httpx.TransportError:
+                if tentativa == tentativas:
+                    raise
+                time.sleep(0.05 * 2 ** (tentativa - 1))
+            finally:
+                duracao = time.perf_counter() - inicio
+                if duracao * 1000 >= LENTO_MS:
+                    logger.warning("consulta lenta %s: %.0f ms (tentativa %d)", nome, duracao * 1000, tentativa)
+                for observador in observadores:
+                    observador(nome, duracao, ok)
+    finally:
+        _timeout_atual.reset(token)
+
+
+def em_paralelo(*funcoes):
+    """Executa consultas independentes ao mesmo tempo e devolve os resultados em ordem."""
+    global _executor
+    if _executor is None:
+        with _cliente_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=int(os.getenv("SUPABASE_PARALELO", "8")), thread_name_prefix='supabase')
+    futuros = [_executor.submit(contextvars.copy_context().run, f) for f in funcoes]
+    return [f.result() for f in futuros]
+
+
+def _primeiro(resposta):
+    return resposta.data[0] if resposta.data else None
+
+
+def _gravar_no_cache(chave, linha):
+    # Invalida nos outros workers e já guarda a versão nova neste
+    cache.invalidar(chave)
+    if linha:
+        cache.set(chave, linha)
+
+
+# ============== USUÁRIOS ==============
+
+def buscar_usuario(usuario_id):
+    chave = ('usuario', usuario_id)
+    user = cache.get(chave)
+    if user is None:
+        user = _primeiro(executar(
+            tabela(TABELA_USUARIOS).select('*').eq('id', usuario_id),
+            'usuarios.buscar', tentativas=TENTATIVAS_LEITURA
+        ))
+        if user:
+            cache.set(chave, user)
+    return user
+
+
+def buscar_usuario_ativo_por_email(email, colunas='*'):
+    return _primeiro(executar(
+        tabela(TABELA_USUARIOS).select(colunas).eq('email', email).eq('ativo', True),
+        'usuarios.por_email', tentativas=TENTATIVAS_LEITURA
+    ))
+
+
+def email_cadastrado(email):
+    return _primeiro(executar(
+        tabela(TABELA_USUARIOS).select('id').eq('email', email),
+        'usuarios.email_existe', tentativas=TENTATIVAS_LEITURA
+    )) is not None
+
+
+def criar_usuario(user_data):
+    return _primeiro(executar(tabela(TABELA_USUARIOS).insert(user_data), 'usuarios.criar'))
+
+
+def atualizar_usuario(usuario_id, update_data):
+    resposta = executar(tabela(TABELA_USUARIOS).update(update_data).eq('id', usuario_id), 'usuarios.atualizar')
+    _gravar_no_cache(('usuario', usuario_id), _primeiro(resposta))
+    return resposta
+
+
+# ============== CUSTOS FIXOS ==============
+
+def buscar_custos_fixos(usuario_id):
+    chave = ('custos_fixos', usuario_id)
+    custos = cache.get(chave)
+    if custos is None:
+        custos = _primeiro(executar(
+            tabela(TABELA_CUSTOS).select('*').eq('usuario_id', usuario_id),
+            'custos_fixos.buscar', tentativas=TENTATIVAS_LEITURA
+        ))
+        if custos:
+            cache.set(chave, custos)
+    return custos
+
+
+def criar_custos_fixos(custos_data):
+    resposta = executar(tabela(TABELA_CUSTOS).insert(custos_data), 'custos_fixos.criar')
+    _gravar_no_cache(('custos_fixos', custos_data['usuario_id']), _primeiro(resposta))
+    return resposta
+
+
+def salvar_custos_fixos(usuario_id, custos_data):
+    existente = _primeiro(executar(
+        tabela(TABELA_CUSTOS).select('id').eq('usuario_id', usuario_id),
+        'custos_fixos.existe', tentativas=TENTATIVAS_LEITURA
+    ))
+    if existente:
+        resposta = executar(tabela(TABELA_CUSTOS).update(custos_data).eq('usuario_id', usuario_id), 'custos_fixos.atualizar')
+        _gravar_no_cache(('custos_fixos', usuario_id), _primeiro(resposta))
+        return resposta
+    return criar_custos_fixos(custos_data)
+
+
+# ============== ORÇAMENTOS ==============
+
+def buscar_orcamento(usuario_id, orcamento_id, colunas='*'):
+    return _primeiro(executar(
+        tabela(TABELA_ORCAMENTOS).select(colunas).eq('id', orcamento_id).eq('usuario_id', usuario_id),
+        'orcamentos.buscar', tentativas=TENTATIVAS_LEITURA
+    ))
+
+
+def buscar_orcamentos(usuario_id, ids=None, data_inicio=None, data_fim=None, limite=500):
+    query = tabela(TABELA_ORCAMENTOS).select('*').eq('usuario_id', usuario_id)
+    if ids:
+        query = query.in_('id', ids)
+    if data_inicio:
+        query = query.gte('created_at', data_inicio)
+    if data_fim:
+        query = query.lte('created_at', f"{data_fim}T23:59:59.999999")
+    return executar(
+        query.order('created_at', desc=True).limit(limite),
+        'orcamentos.listar', tentativas=TENTATIVAS_LEITURA
+    ).data or []
+
+
+def inserir_orcamento(orcamento_data):
+    return _primeiro(executar(tabela(TABELA_ORCAMENTOS).insert(orcamento_data), 'orcamentos.inserir'))
+
+
+def inserir_orcamentos(linhas, retornar=False):
+    # Insert em lote; sem devolver as linhas na importação
+    return executar(
+        tabela(TABELA_ORCAMENTOS).insert(
+            linhas, returning=ReturnMethod.representation if retornar else ReturnMethod.minimal
+        ),
+        'orcamentos.inserir_lote', timeout=max(TIMEOUT_PADRAO, 60)
+    )
+
+
+def atualizar_orcamentos(usuario_id, linhas):
+    # Valores recalculados de vários orçamentos em um único update (sql/004_operacoes_lote.sql)
+    return executar(
+        cliente().rpc('lorena_atualizar_orcamentos', {'p_usuario_id': usuario_id, 'p_itens': linhas}),
+        'orcamentos.atualizar_lote', timeout=max(TIMEOUT_PADRAO, 60)
+    ).data or []
+
+
+def buscar_dados_completos(apos_id, limite):
+    # Varredura por id para a compactação (todos os usuários)
+    return executar(
+        tabela(TABELA_ORCAMENTOS).select('id, dados_completos').gt('id', apos_id).order('id').limit(limite),
+        'orcamentos.dados_completos', timeout=max(TIMEOUT_PADRAO, 60), tentativas=TENTATIVAS_LEITURA
+    ).data or []
+
+
+def gravar_dados_completos(itens):
+    # Um update por lote: [{"id", "dados_completos"}] (sql/003_dados_compactos.sql)
+    return executar(
+        cliente().rpc('lorena_gravar_dados_completos', {'p_itens': itens}),
+        'orcamentos.gravar_dados_completos', timeout=max(TIMEOUT_PADRAO, 60)
+    )
+
+
+def deletar_orcamento(usuario_id, orcamento_id):
+    return executar(
+        tabela(TABELA_ORCAMENTOS).delete().eq('id', orcamento_id).eq('usuario_id', usuario_id),
+        'orcamentos.deletar'
+    )
+
+
+def deletar_orcamentos(usuario_id, ids):
+    return executar(
+        tabela(TABELA_ORCAMENTOS).delete().in_('id', ids).eq('usuario_id', usuario_id),
+        'orcamentos.deletar_lote', timeout=max(TIMEOUT_PADRAO, 60)
+    ).data or []
+
+
+# ============== ESTATÍSTICAS ==============
+
+def acumular_estatisticas(itens):
+    # Deltas somados atomicamente no banco (sql/002_estatisticas.sql)
+    return executar(
+        cliente().rpc('lorena_acumular_estatisticas', {'p_itens': itens}),
+        'estatisticas.acumular'
+    )
+
+
+def buscar_estatisticas(usuario_id):
+    return executar(
+        tabela(TABELA_ESTATISTICAS).select('*').eq('usuario_id', usuario_id),
+        'estatisticas.buscar', tentativas=TENTATIVAS_LEITURA
+    ).data or []
@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+
+from flask import abort, request, send_file
+
+try:
+    import brotli
+except ImportError:  # opcional: sem o pacote, só gzip
+    brotli = None
+
+# Arquivos estáticos com hash do conteúdo no nome (css/style.<hash>.css).
+# url_for('static', ...) gera o nome com hash, então o navegador pode guardar
+# o arquivo por um ano sem revalidar; um deploy que muda o arquivo muda a URL.
+# As versões gzip/brotli são geradas uma vez em ESTATICOS_DIR (compartilhado
+# pelos workers) e servidas conforme o Accept-Encoding.
+
+logger = logging.getLogger('estaticos')
+
+MAX_AGE = 365 * 24 * 3600
+COMPRIMIVEIS = ('.css', '.js', '.svg', '.ico', '.json', '.txt', '.html')
+TAMANHO_MINIMO = 512
+
+
+class Estaticos:
+    def __init__(self, pasta, diretorio=None):
+        self.pasta = pasta
+        self.diretorio = diretorio or os.path.join(tempfile.gettempdir(), f'lorena-static-{os.getuid()}')
+        self.nomes = {}      # 'css/style.css' -> 'css/style.<hash>.css'
+        self._arquivos = {}  # 'css/style.<hash>.css' -> (caminho, hash, {codificação: caminho})
+
+    def carregar(self):
+        """Calcula os hashes e gera as versões comprimidas que ainda não existem."""
+        self._preparar_diretorio()
+        for raiz, _, arquivos in os.walk(self.pasta):
+            for nome in arquivos:
+                caminho = os.path.join(raiz, nome)
+                logico = os.path.relpath(caminho, self.pasta).replace(os.sep, '/')
+                with open(caminho, 'rb') as f:
+                    conteudo = f.read()
+                hash_ = hashlib.sha256(conteudo).hexdigest()[:12]
+                base, extensao = os.path.splitext(logico)
+                versionado = f'{base}.{hash_}{extensao}'
+                self.nomes[logico] = versionado
+                self._arquivos[versionado] = (caminho, hash_, self._comprimir(hash_, extensao, conteudo))
+        return self
+
+    def _preparar_diretorio(self):
+        # As variantes existentes são servidas como imutáveis por um ano: um
+        # diretório em que outro usuário consiga escrever permitiria trocar o
+        # JS/CSS servido. Só usa o diretório se for deste usuário (e 0700).
+        os.makedirs(self.diretorio, mode=0o700, exist_ok=True)
+        if os.stat(self.diretorio).st_uid != os.getuid():
+            logger.warning('%s não pertence a este usuário; usando um diretório temporário', self.diretorio)
+            self.diretorio = tempfile.mkdtemp(prefix='lorena-static-')
+        os.chmod(self.diretorio, 0o700)
+
+    def _comprimir(self, hash_, extensao, conteudo):
+        if extensao.lower() not in COMPRIMIVEIS or len(conteudo) < TAMANHO_MINIMO:
+            return {}
+        variantes = {'gzip': (f'{hash_}{extensao}.gz', lambda: gzip.compress(conteudo, 9, mtime=0))}
+        if brotli is not None:
+            variantes['br'] = (f'{hash_}{extensao}.br', lambda: brotli.compress(conteudo, quality=11))
+        saida = {}
+        for codificacao, (nome, comprimir) in variantes.items():
+            caminho = os.path.join(self.diretorio, nome)
+            if not os.path.exists(caminho):
+                dados = comprimir()
+                if len(dados) >= len(conteudo):
+                    continue
+                temporario = f'{caminho}.{os.getpid()}.tmp'
+                with open(temporario, 'wb') as f:
+                    f.write(dados)
+                os.replace(temporario, caminho)
+            saida[codificacao] = caminho
+        return saida
+
+    def url_defaults(self, endpoint, values):
+        # Troca o nome pelo versionado em url_for('static', filename=...)
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.nomes.get(values['filename'], values['filename'])
+
+    def servir(self, filename):
+        arquivo = self._arquivos.get(filename)
+        if arquivo is None:
+            # Nome sem hash (links antigos, favicon pedido pelo navegador): cache curto
+            if filename not in self.nomes:
+                abort(404)
+            return send_file(os.path.join(self.pasta, filename), max_age=3600, conditional=True)
+
+        caminho, hash_, variantes = arquivo
+        aceitas = request.accept_encodings
+        codificacao = next((c for c in ('br', 'gzip') if c in variantes and aceitas[c]), None)
+        resposta = send_file(
+            variantes[codificacao] if codificacao else caminho,
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            etag=f'{hash_}-{codificacao}' if codificacao else hash_,
+            max_age=MAX_AGE,
+            conditional=True
+        )
+        if codificacao:
+            resposta.content_encoding = codificacao
+        if variantes:
+            resposta.vary.add('Accept-Encoding')
+        resposta.cache_control.public = True
+        resposta.cache_control.immutable = True
+        return resposta
+
+
+def instalar(app):
+    estaticos = Estaticos(app.static_folder, os.getenv("ESTATICOS_DIR") or None).carregar()
+    app.url_defaults(estaticos.url_defaults)
+    app.view_functions['static'] = estaticos.servir
+    app.extensions['estaticos'] = estaticos
+    return estaticos
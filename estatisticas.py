@@ -0,0 +1,126 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from functools import partial
+
+import dados
+from precificacao import custo_hora
+
+# Estatísticas do dashboard a partir de agregados mantidos incrementalmente
+# em lorena-estatisticas_mensais (uma linha por usuário, mês e tipo de
+# serviço). Salvar, excluir e importar orçamentos enviam deltas; o painel lê
+# só os agregados, então o custo não cresce com o histórico.
+
+logger = logging.getLogger('estatisticas')
+
+# Faixas do percentual total de ajustes (soma dos graus), como no SQL
+FAIXAS = (('0', 0), ('1-10', 10), ('11-20', 20), ('21-40', 40), ('41+', None))
+
+CAMPOS_SOMA = ('soma_valor_total', 'soma_horas', 'soma_urgencia',
+               'soma_especificidade', 'soma_complexidade')
+
+
+def faixa_ajuste(percentual):
+    for nome, limite in FAIXAS:
+        if limite is None or percentual <= limite:
+            return nome
+
+
+def _mes(created_at):
+    # Orçamentos sem created_at (insert sem retorno) recebem now() no banco
+    if not created_at:
+        return datetime.now(timezone.utc).strftime('%Y-%m-01')
+    return f"{str(created_at)[:7]}-01"
+
+
+def deltas(orcamentos, sinal=1):
+    """Agrupa orçamentos em deltas por (usuário, mês, tipo de serviço)."""
+    grupos = {}
+    for o in orcamentos:
+        chave = (o['usuario_id'], _mes(o.get('created_at')), o.get('tipo_servico') or '')
+        item = grupos.get(chave)
+        if item is None:
+            item = grupos[chave] = {
+                'usuario_id': chave[0], 'mes': chave[1], 'tipo_servico': chave[2],
+                'quantidade': 0, 'faixas_ajuste': defaultdict(int),
+                **{campo: 0.0 for campo in CAMPOS_SOMA}
+            }
+        graus = [int(o.get(c) or 0) for c in ('grau_urgencia', 'grau_especificidade', 'grau_complexidade')]
+        item['quantidade'] += sinal
+        item['soma_valor_total'] += sinal * float(o.get('valor_total') or 0)
+        item['soma_horas'] += sinal * float(o.get('horas_analise') or 0)
+        item['soma_urgencia'] += sinal * graus[0]
+        item['soma_especificidade'] += sinal * graus[1]
+        item['soma_complexidade'] += sinal * graus[2]
+        item['faixas_ajuste'][faixa_ajuste(sum(graus))] += sinal
+    return [{**item, 'faixas_ajuste': dict(item['faixas_ajuste'])} for item in grupos.values()]
+
+
+def registrar(orcamentos, sinal=1, anteriores=()):
+    """Envia os deltas numa única chamada. Falhas são registradas, não propagadas:
+    o orçamento já foi gravado e lorena_recalcular_estatisticas corrige a divergência.
+    Em alterações, `anteriores` são as versões antigas, descontadas na mesma chamada."""
+    itens = deltas(anteriores, -sinal) + deltas(orcamentos, sinal)
+    if not itens:
+        return
+    try:
+        dados.acumular_estatisticas(itens)
+    except Exception:
+        logger.exception('falha ao atualizar estatísticas (%d grupo(s))', len(itens))
+
+
+def resumo(usuario_id, meses=12):
+    """Painel do dashboard: totais por mês, por tipo de serviço, faixas de ajuste e margem."""
+    linhas, custos = dados.em_paralelo(
+        partial(dados.buscar_estatisticas, usuario_id),
+        partial(dados.buscar_custos_fixos, usuario_id)
+    )
+    custo = custo_hora(custos)
+
+    def vazio():
+        return {'quantidade': 0, **{campo: 0.0 for campo in CAMPOS_SOMA}}
+
+    def acumular(destino, linha):
+        destino['quantidade'] += int(linha.get('quantidade') or 0)
+        for campo in CAMPOS_SOMA:
+            destino[campo] += float(linha.get(campo) or 0)
+
+    def fechar(grupo):
+        quantidade, receita = grupo['quantidade'], grupo['soma_valor_total']
+        custo_total = custo * grupo['soma_horas']
+        return {
+            'quantidade': quantidade,
+            'valor_total': round(receita, 2),
+            'ticket_medio': round(receita / quantidade, 2) if quantidade else 0.0,
+            'horas': round(grupo['soma_horas'], 2),
+            'custo_fixo': round(custo_total, 2),
+            'margem': round((receita - custo_total) / receita * 100, 1) if receita > 0 else None,
+        }
+
+    geral, por_mes, por_tipo = vazio(), defaultdict(vazio), defaultdict(vazio)
+    faixas = {nome: 0 for nome, _ in FAIXAS}
+    for linha in linhas:
+        mes = str(linha['mes'])[:7]
+        acumular(geral, linha)
+        acumular(por_mes[mes], linha)
+        acumular(por_tipo[linha.get('tipo_servico') or 'Sem tipo'], linha)
+        for nome, quantidade in (linha.get('faixas_ajuste') or {}).items():
+            faixas[nome] = faixas.get(nome, 0) + int(quantidade)
+
+    quantidade = geral['quantidade']
+    return {
+        'custo_hora': round(custo, 2),
+        'geral': {
+            **fechar(geral),
+            'media_ajustes': {
+                campo: round(geral[f'soma_{campo}'] / quantidade, 1) if quantidade else 0.0
+                for campo in ('urgencia', 'especificidade', 'complexidade')
+            },
+        },
+        'meses': [{'mes': mes, **fechar(por_mes[mes])} for mes in sorted(por_mes)[-meses:]],
+        'tipos': sorted(
+            ({'tipo_servico': tipo, **fechar(grupo)} for tipo, grupo in por_tipo.items()),
+            key=lambda t: t['valor_total'], reverse=True
+        ),
+        'faixas_ajuste': faixas,
+    }
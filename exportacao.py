@@ -0,0 +1,132 @@
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pdf_cache import chave_pdf, nome_arquivo
+
+# Exportação em lote: vários PDFs em um único ZIP transmitido em streaming.
+# A renderização roda em um pool de processos (ReportLab é CPU puro), e cada
+# PDF entra no arquivo assim que fica pronto.
+
+logger = logging.getLogger('exportacao')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Com workers gthread, renderizar no próprio worker prende o GIL e atrasa as
+# outras threads; com PDF_EM_PROCESSO=1 o PDF avulso também vai para o pool
+EM_PROCESSO = os.getenv("PDF_EM_PROCESSO", "0") == "1"
+TIMEOUT_PDF = float(os.getenv("PDF_TIMEOUT", "60"))
+
+
+def pool_pdf():
+    # Criado sob demanda, depois do fork do gunicorn, um por worker. forkserver:
+    # o worker já tem várias threads (requisições, httpx, fila), e um fork dele
+    # poderia herdar locks presos; os processos do pool saem de um servidor
+    # limpo, que já importou o ReportLab uma vez
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = int(os.getenv("PDF_POOL_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+            contexto = multiprocessing.get_context('forkserver')
+            contexto.set_forkserver_preload(['pdf_proposta'])
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=contexto)
+        return _pool
+
+
+def _renderizar_no_pool(orcamento, user):
+    from pdf_proposta import renderizar
+    return renderizar(orcamento, user)
+
+
+def enviar_pdf(orcamento, user):
+    """Agenda a renderização no pool; o resultado sai com resultado_pdf()."""
+    return pool_pdf().submit(_renderizar_no_pool, orcamento, user)
+
+
+def resultado_pdf(futuro, timeout=None):
+    # O doc.build roda no processo filho: o tempo volta junto com os bytes e
+    # é registrado aqui, no histograma do worker que aparece em /metrics
+    from metricas import PDF_BUILD
+    pdf_bytes, segundos = futuro.result(timeout=timeout)
+    PDF_BUILD.observar(segundos)
+    return pdf_bytes
+
+
+def renderizar_pdf(orcamento, user):
+    """PDF de um orçamento, no pool de processos (PDF_EM_PROCESSO=1) ou na thread atual."""
+    if EM_PROCESSO:
+        return resultado_pdf(enviar_pdf(orcamento, user), timeout=TIMEOUT_PDF)
+    from pdf_proposta import gerar_pdf_proposta
+    return gerar_pdf_proposta(orcamento, user)
+
+
+class _SaidaZip:
+    # Destino não-posicionável para o ZipFile: acumula bytes até serem drenados
+    def __init__(self):
+        self._partes = []
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def drenar(self):
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def _nome_unico(orcamento, usados):
+    nome = nome_arquivo(orcamento)
+    if nome in usados:
+        base, ext = os.path.splitext(nome)
+        nome = f"{base}_{orcamento.get('id')}{ext}"
+    usados.add(nome)
+    return nome
+
+
+def gerar_zip(orcamentos, user, cache, usuario_id):
+    """Gerador que produz o ZIP em pedaços, conforme os PDFs ficam prontos."""
+    saida = _SaidaZip()
+    usados = set()
+
+    # PDFs já são comprimidos: deflate de novo só gastaria CPU
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_STORED) as zf:
+        pendentes = {}
+        for orcamento in orcamentos:
+            chave = chave_pdf(orcamento, user)
+            pdf_bytes = cache.get(chave, usuario_id, orcamento['id'])
+            if pdf_bytes is not None:
+                zf.writestr(_nome_unico(orcamento, usados), pdf_bytes)
+                yield saida.drenar()
+            else:
+                futuro = enviar_pdf(orcamento, user)
+                pendentes[futuro] = (orcamento, chave)
+
+        erros = []
+        for futuro in as_completed(pendentes):
+            # pop: os bytes de cada PDF são liberados assim que entram no ZIP
+            orcamento, chave = pendentes.pop(futuro)
+            try:
+                pdf_bytes = resultado_pdf(futuro)
+            except Exception as e:
+                # O ZIP já está sendo transmitido: registra e segue, para fechar o arquivo
+                logger.exception('falha ao renderizar o PDF do orçamento %s', orcamento.get('id'))
+                erros.append(f"{orcamento.get('numero') or orcamento.get('id')}: {e}")
+                continue
+            cache.put(chave, usuario_id, orcamento['id'], pdf_bytes)
+            zf.writestr(_nome_unico(orcamento, usados), pdf_bytes)
+            del pdf_bytes
+            yield saida.drenar()
+
+        if erros:
+            zf.writestr('ERROS.txt', 'PDFs não gerados:\n' + '\n'.join(erros) + '\n')
+
+    # Diretório central do ZIP
+    yield saida.drenar()
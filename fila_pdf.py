@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import partial
+
+from exportacao import enviar_pdf, resultado_pdf
+from pdf_cache import CAMPOS_USUARIO
+
+# Fila de geração assíncrona de PDFs.
+# O estado dos jobs fica num SQLite local compartilhado entre os workers do
+# gunicorn (qualquer worker responde ao status e ao download) e os PDFs
+# prontos ficam em arquivos no mesmo diretório. Cada worker tem uma thread
+# despachante que reivindica jobs pendentes e os renderiza no pool de
+# processos, respeitando um limite global de jobs em andamento.
+
+logger = logging.getLogger('fila_pdf')
+
+PENDENTE = 'pendente'
+PROCESSANDO = 'processando'
+PRONTO = 'pronto'
+ERRO = 'erro'
+
+# Intervalo de varredura do despachante (jobs enviados por outros workers)
+INTERVALO = 1.0
+# Job em processamento há mais tempo que isso é considerado órfão (worker morto)
+TIMEOUT_PROCESSANDO = 300
+INTERVALO_LIMPEZA = 60
+
+_ESQUEMA = """
+create table if not exists jobs (
+    id text primary key,
+    usuario_id integer not null,
+    orcamento_id integer not null,
+    chave text not null,
+    status text not null,
+    payload text,
+    nome_arquivo text,
+    erro text,
+    criado_em real not null,
+    atualizado_em real not null,
+    expira_em real
+);
+create index if not exists jobs_chave on jobs (usuario_id, chave);
+create index if not exists jobs_status on jobs (status, criado_em);
+"""
+
+
+class FilaCheia(Exception):
+    pass
+
+
+class FilaPdf:
+    def __init__(self, diretorio, concorrencia=2, ttl=600, max_pendentes=200, ao_concluir=None):
+        self.diretorio = diretorio
+        self.concorrencia = concorrencia
+        self.ttl = ttl
+        self.max_pendentes = max_pendentes
+        # Callback (job, pdf_bytes) chamado no worker que renderizou
+        self.ao_concluir = ao_concluir
+        self._banco = os.path.join(diretorio, 'jobs.sqlite3')
+        self._acordar = threading.Event()
+        self._despachante = None
+        self._lock = threading.Lock()
+        # Payloads e PDFs têm dados de clientes: só o usuário do processo lê
+        os.makedirs(diretorio, mode=0o700, exist_ok=True)
+        os.chmod(diretorio, 0o700)
+        con = self._conectar()
+        try:
+            con.execute('pragma journal_mode=wal')
+            con.executescript(_ESQUEMA)
+        finally:
+            con.close()
+
+    def _conectar(self):
+        con = sqlite3.connect(self._banco, timeout=10, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def _caminho(self, job_id):
+        return os.path.join(self.diretorio, f"{job_id}.pdf")
+
+    # --- API ---
+
+    def enviar(self, usuario_id, orcamento, user, chave, nome_arquivo, pdf_bytes=None):
+        """Cria o job (ou devolve o idêntico já em andamento/pronto). Com pdf_bytes, já nasce pronto."""
+        agora = time.time()
+        con = self._conectar()
+        try:
+            con.execute('begin immediate')
+            existente = con.execute(
+                "select * from jobs where usuario_id = ? and chave = ? and status != ? "
+                "and (expira_em is null or expira_em > ?) order by criado_em desc limit 1",
+                (usuario_id, chave, ERRO, agora)
+            ).fetchone()
+            if existente:
+                con.execute('commit')
+                return self._publico(existente)
+
+            if pdf_bytes is None:
+                pendentes = con.execute("select count(*) from jobs where status = ?", (PENDENTE,)).fetchone()[0]
+                if pendentes >= self.max_pendentes:
+                    con.execute('rollback')
+                    raise FilaCheia(f'{pendentes} PDFs na fila')
+
+            job_id = secrets.token_hex(16)
+            if pdf_bytes is not None:
+                self._gravar(job_id, pdf_bytes)
+                status, payload, expira_em = PRONTO, None, agora + self.ttl
+            else:
+                status, expira_em = PENDENTE, None
+                # Só os campos do perfil impressos no PDF (nada de senha_hash no disco)
+                perfil = {campo: user.get(campo) for campo in CAMPOS_USUARIO}
+                payload = json.dumps({'orcamento': orcamento, 'user': perfil}, default=str)
+            con.execute(
+                "insert into jobs (id, usuario_id, orcamento_id, chave, status, payload, nome_arquivo, "
+                "criado_em, atualizado_em, expira_em) values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, usuario_id, orcamento['id'], chave, status, payload, nome_arquivo, agora, agora, expira_em)
+            )
+            con.execute('commit')
+        finally:
+            con.close()
+
+        if status == PENDENTE:
+            self._garantir_despachante()
+            self._acordar.set()
+        return self.status(job_id, usuario_id)
+
+    def status(self, job_id, usuario_id):
+        con = self._conectar()
+        try:
+            job = con.execute(
+                "select * from jobs where id = ? and usuario_id = ?", (job_id, usuario_id)
+            ).fetchone()
+        finally:
+            con.close()
+        if not job or (job['expira_em'] and job['expira_em'] <= time.time()):
+            return None
+        return self._publico(job)
+
+    def arquivo(self, job_id, usuario_id):
+        """(caminho, nome para download) de um job pronto; None se não existir ou não estiver pronto."""
+        job = self.status(job_id, usuario_id)
+        if not job or job['status'] != PRONTO:
+            return None
+        caminho = self._caminho(job_id)
+        return (caminho, job['nome_arquivo']) if os.path.exists(caminho) else None
+
+    def stats(self):
+        con = self._conectar()
+        try:
+            contagem = dict(con.execute("select status, count(*) from jobs group by status").fetchall())
+        finally:
+            con.close()
+        return {'concorrencia': self.concorrencia, 'ttl': self.ttl, **{s: contagem.get(s, 0) for s in (PENDENTE, PROCESSANDO, PRONTO, ERRO)}}
+
+    def limpar_expirados(self):
+        agora = time.time()
+        con = self._conectar()
+        try:
+            ids = [r[0] for r in con.execute("select id from jobs where expira_em <= ?", (agora,))]
+            con.execute("delete from jobs where expira_em <= ?", (agora,))
+        finally:
+            con.close()
+        for job_id in ids:
+            try:
+                os.remove(self._caminho(job_id))
+            except OSError:
+                pass
+        return len(ids)
+
+    @staticmethod
+    def _publico(job):
+        return {
+            'id': job['id'],
+            'orcamento_id': job['orcamento_id'],
+            'status': job['status'],
+            'nome_arquivo': job['nome_arquivo'],
+            'erro': job['erro'],
+            'criado_em': job['criado_em'],
+            'expira_em': job['expira_em'],
+        }
+
+    # --- despacho ---
+
+    def _garantir_despachante(self):
+        # Thread criada sob demanda, depois do fork do gunicorn
+        with self._lock:
+            if self._despachante is None or not self._despachante.is_alive():
+                self._despachante = threading.Thread(target=self._laco, name='fila-pdf', daemon=True)
+                self._despachante.start()
+
+    def _laco(self):
+        ultima_limpeza = 0.0
+        while True:
+            self._acordar.wait(INTERVALO)
+            self._acordar.clear()
+            try:
+                self._recuperar_orfaos()
+                while (job := self._reivindicar()) is not None:
+                    try:
+                        self._iniciar(job)
+                    except Exception as e:
+                        # Payload ilegível, pool quebrado...: sem isso o job ficaria
+                        # em processamento, ocupando uma vaga até virar órfão
+                        logger.exception('falha ao iniciar o job %s', job['id'])
+                        self._finalizar(job['id'], ERRO, str(e))
+                if time.monotonic() - ultima_limpeza > INTERVALO_LIMPEZA:
+                    self.limpar_expirados()
+                    ultima_limpeza = time.monotonic()
+            except Exception:
+                logger.exception('erro no despacho da fila de PDFs')
+
+    def _reivindicar(self):
+        # Limite global: conta os jobs em processamento em todos os workers
+        agora = time.time()
+        con = self._conectar()
+        try:
+            con.execute('begin immediate')
+            em_andamento = con.execute("select count(*) from jobs where status = ?", (PROCESSANDO,)).fetchone()[0]
+            job = None
+            if em_andamento < self.concorrencia:
+                job = con.execute(
+                    "select * from jobs where status = ? order by criado_em limit 1", (PENDENTE,)
+                ).fetchone()
+                if job:
+                    con.execute(
+                        "update jobs set status = ?, atualizado_em = ? where id = ?", (PROCESSANDO, agora, job['id'])
+                    )
+            con.execute('commit')
+            return job
+        finally:
+            con.close()
+
+    def _recuperar_orfaos(self):
+        con = self._conectar()
+        try:
+            con.execute(
+                "update jobs set status = ? where status = ? and atualizado_em < ?",
+                (PENDENTE, PROCESSANDO, time.time() - TIMEOUT_PROCESSANDO)
+            )
+        finally:
+            con.close()
+
+    def _iniciar(self, job):
+        payload = json.loads(job['payload'])
+        futuro = enviar_pdf(payload['orcamento'], payload['user'])
+        futuro.add_done_callback(partial(self._concluir, dict(job)))
+
+    def _concluir(self, job, futuro):
+        try:
+            pdf_bytes = resultado_pdf(futuro)
+            self._gravar(job['id'], pdf_bytes)
+            campos = (PRONTO, None)
+        except Exception as e:
+            logger.exception('falha ao renderizar o PDF do job %s', job['id'])
+            pdf_bytes, campos = None, (ERRO, str(e))
+
+        self._finalizar(job['id'], *campos)
+        if pdf_bytes is not None and self.ao_concluir:
+            try:
+                self.ao_concluir(job, pdf_bytes)
+            except Exception:
+                logger.exception('erro no callback de conclusão do job %s', job['id'])
+        # Libera a vaga: o próximo pendente já pode ser reivindicado
+        self._acordar.set()
+
+    def _finalizar(self, job_id, status, erro):
+        agora = time.time()
+        con = self._conectar()
+        try:
+            con.execute(
+                "update jobs set status = ?, erro = ?, payload = null, atualizado_em = ?, expira_em = ? where id = ?",
+                (status, erro, agora, agora + self.ttl, job_id)
+            )
+        finally:
+            con.close()
+
+    def _gravar(self, job_id, pdf_bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        os.replace(tmp, self._caminho(job_id))
@@ -0,0 +1,98 @@
+import logging
+import os
+import threading
+
+from cachetools import LRUCache
+from flask import current_app
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+# Cache de renderização dos templates.
+# - Bytecode do Jinja em disco, compartilhado pelos workers: cada template é
+#   compilado uma vez, não uma vez por worker a cada deploy.
+# - Fragmentos HTML dos cards do histórico em memória (LRU por worker). A
+#   chave tem todos os campos impressos no card, então um orçamento alterado
+#   (reprecificação em lote) gera outra chave em qualquer worker;
+#   invalidar_cards() só libera o espaço das versões antigas mais cedo.
+
+logger = logging.getLogger('fragmentos')
+
+TEMPLATE_CARD = 'partials/orcamento_card.html'
+CAMPOS_CARD = ('id', 'created_at', 'numero', 'nome_cliente', 'tipo_servico', 'valor_total')
+
+
+class CacheFragmentos:
+    def __init__(self, maxsize=5000):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, chave, gerar):
+        with self._lock:
+            html = self._cache.get(chave)
+            if html is not None:
+                self.hits += 1
+                return html
+            self.misses += 1
+        html = gerar()
+        with self._lock:
+            self._cache[chave] = html
+        return html
+
+    def invalidar(self, filtro):
+        with self._lock:
+            for chave in [c for c in self._cache if filtro(c)]:
+                self._cache.pop(chave, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'itens': len(self._cache),
+                'max_itens': self._cache.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+cache = CacheFragmentos(maxsize=int(os.getenv("FRAGMENTOS_MAX", "5000")))
+
+
+def card_orcamento(orc):
+    """HTML do card do histórico, renderizado uma vez por orçamento."""
+    def gerar():
+        return Markup(current_app.jinja_env.get_template(TEMPLATE_CARD).render(orc=orc))
+    return cache.obter(('card',) + tuple(str(orc.get(campo)) for campo in CAMPOS_CARD), gerar)
+
+
+def invalidar_cards(ids):
+    """Descarta os cards dos orçamentos alterados ou excluídos."""
+    ids = {str(id_) for id_ in ids}
+    cache.invalidar(lambda chave: chave[0] == 'card' and chave[1] in ids)
+
+
+def _bytecode_cache(diretorio):
+    # O bytecode é carregado com marshal: um diretório em que outro usuário
+    # consiga escrever permitiria executar código no app. Sem JINJA_CACHE_DIR,
+    # o Jinja usa o próprio diretório por usuário (0700, dono conferido).
+    if not diretorio:
+        return FileSystemBytecodeCache()
+    os.makedirs(diretorio, mode=0o700, exist_ok=True)
+    if os.stat(diretorio).st_uid != os.getuid():
+        logger.warning('JINJA_CACHE_DIR %s não pertence a este usuário; usando o diretório padrão', diretorio)
+        return FileSystemBytecodeCache()
+    os.chmod(diretorio, 0o700)
+    return FileSystemBytecodeCache(diretorio)
+
+
+def instalar(app):
+    """Bytecode cache compartilhado, helper card_orcamento nos templates e pré-compilação."""
+    app.jinja_env.bytecode_cache = _bytecode_cache(os.getenv("JINJA_CACHE_DIR"))
+    app.jinja_env.globals['card_orcamento'] = card_orcamento
+
+    # Compila (ou lê do bytecode) todos os templates já na criação do app;
+    # com --preload, os workers herdam os templates prontos
+    for nome in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(nome)
@@ -0,0 +1,22 @@
+import os
+
+# Configuração do gunicorn (Procfile: gunicorn -c gunicorn.conf.py 'app:create_app()').
+#
+# Workers gthread: cada processo atende GUNICORN_THREADS requisições ao mesmo
+# tempo. Quase todo o tempo de uma rota é espera pelo Supabase (I/O, GIL
+# liberado), então algumas respostas lentas do upstream não ocupam mais todos
+# os workers. O cliente Supabase/httpx é compartilhado pelas threads do worker
+# (ver dados.py). O PDF, que é CPU puro, vai para o pool de processos.
+# GUNICORN_WORKER=sync volta ao modelo anterior (uma requisição por processo).
+
+bind = os.getenv("BIND", "0.0.0.0:80")
+workers = int(os.getenv("WEB_CONCURRENCY", "3"))
+worker_class = os.getenv("GUNICORN_WORKER", "gthread")
+# Com threads > 1 o gunicorn troca sync por gthread sozinho
+threads = int(os.getenv("GUNICORN_THREADS", "8")) if worker_class == 'gthread' else 1
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = 5
+
+if worker_class == 'gthread':
+    os.environ.setdefault("PDF_EM_PROCESSO", "1")
@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+import os
+import re
+
+import dados
+import estatisticas
+from orcamentos import CAMPOS_FLOAT, CAMPOS_INT, montar_orcamento, recalculavel
+
+# Importação em lote de orçamentos (planilhas antigas) a partir de CSV ou JSONL.
+# O arquivo é lido linha a linha por geradores e inserido em lotes, então o
+# uso de memória não depende do tamanho do arquivo. Erros são reportados por
+# linha sem interromper a importação.
+
+LOTE_PADRAO = int(os.getenv("IMPORTACAO_LOTE", "500"))
+
+# Quantidade máxima de erros detalhados no relatório (os demais só são contados)
+MAX_ERROS_RELATORIO = 1000
+
+
+# "1.500", "12.345.678": ponto como separador de milhar (sem vírgula decimal)
+_MILHAR = re.compile(r'-?[1-9]\d{0,2}(\.\d{3})+')
+
+
+def _numero_br(valor):
+    # "1.234,56" -> "1234.56"; "1.500" -> "1500"; "1.5" e "0.125" passam intactos
+    if not isinstance(valor, str):
+        return valor
+    valor = valor.strip()
+    if ',' in valor:
+        return valor.replace('.', '').replace(',', '.')
+    if _MILHAR.fullmatch(valor):
+        return valor.replace('.', '')
+    return valor
+
+
+def ler_csv(stream):
+    texto = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    primeira = texto.readline()
+    # Excel em pt-BR exporta com ";" como separador
+    delimitador = ';' if primeira.count(';') > primeira.count(',') else ','
+    cabecalho = [campo.strip() for campo in next(csv.reader([primeira], delimiter=delimitador))]
+
+    for numero_linha, valores in enumerate(csv.reader(texto, delimiter=delimitador), start=2):
+        if not any(v.strip() for v in valores):
+            continue
+        # Células vazias são tratadas como ausentes (valores padrão)
+        yield numero_linha, {campo: valor.strip() for campo, valor in zip(cabecalho, valores) if valor.strip()}
+
+
+def ler_jsonl(stream):
+    for numero_linha, bruto in enumerate(io.TextIOWrapper(stream, encoding='utf-8-sig'), start=1):
+        if bruto.strip():
+            yield numero_linha, bruto
+
+
+def _validar(linha):
+    if not isinstance(linha, dict):
+        raise ValueError('linha não é um objeto')
+    if not linha.get('nome_cliente'):
+        raise ValueError('nome_cliente é obrigatório')
+    if not linha.get('tipo_servico'):
+        raise ValueError('tipo_servico é obrigatório')
+
+
+def _preparar(linha, usuario_id):
+    if isinstance(linha, str):
+        linha = json.loads(linha)
+    _validar(linha)
+    for campo in CAMPOS_FLOAT + CAMPOS_INT:
+        if campo in linha:
+            linha[campo] = _numero_br(linha[campo])
+    for campo in ('ajustes', 'opcoes_pagamento'):
+        if isinstance(linha.get(campo), str):
+            linha[campo] = json.loads(linha[campo])
+    # Planilhas antigas nem sempre têm horas/valor-hora: nesse caso mantém os totais informados
+    return montar_orcamento(linha, usuario_id, numero=linha.get('numero'), recalcular=recalculavel(linha))
+
+
+def importar(linhas, usuario_id, lote=LOTE_PADRAO):
+    """Consome (número da linha, dados) e insere em lotes; devolve o relatório."""
+    relatorio = {'total': 0, 'inseridos': 0, 'com_erro': 0, 'erros': []}
+
+    def erro(numero_linha, mensagem):
+        relatorio['com_erro'] += 1
+        if len(relatorio['erros']) < MAX_ERROS_RELATORIO:
+            relatorio['erros'].append({'linha': numero_linha, 'erro': mensagem})
+
+    def descarregar(pendentes):
+        try:
+            dados.inserir_orcamentos([orcamento for _, orcamento in pendentes])
+            relatorio['inseridos'] += len(pendentes)
+            estatisticas.registrar([orcamento for _, orcamento in pendentes])
+        except Exception:
+            # Lote recusado: insere um a um para apontar a(s) linha(s) com problema
+            for numero_linha, orcamento in pendentes:
+                try:
+                    dados.inserir_orcamentos([orcamento])
+                    relatorio['inseridos'] += 1
+                    estatisticas.registrar([orcamento])
+                except Exception as e:
+                    erro(numero_linha, str(e))
+        pendentes.clear()
+
+    pendentes = []
+    try:
+        for numero_linha, linha in linhas:
+            relatorio['total'] += 1
+            try:
+                pendentes.append((numero_linha, _preparar(linha, usuario_id)))
+            except (ValueError, TypeError) as e:
+                erro(numero_linha, str(e))
+                continue
+
+            if len(pendentes) >= lote:
+                descarregar(pendentes)
+    except (csv.Error, UnicodeDecodeError) as e:
+        # Arquivo corrompido: o que já foi lido é mantido
+        erro(relatorio['total'] + 1, f'arquivo ilegível a partir daqui: {e}')
+
+    if pendentes:
+        descarregar(pendentes)
+    return relatorio
+
+
+def leitor_para(nome_arquivo, formato=None):
+    formato = (formato or os.path.splitext(nome_arquivo or '')[1].lstrip('.')).lower()
+    if formato == 'csv':
+        return ler_csv
+    if formato in ('jsonl', 'ndjson'):
+        return ler_jsonl
+    raise ValueError('Formato não suportado (use CSV ou JSONL)')
@@ -0,0 +1,264 @@
+import bisect
+import cProfile
+import heapq
+import hmac
+import io
+import itertools
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import abort, g, request, Response, template_rendered, before_render_template
+
+# Métricas de latência no formato texto do Prometheus, sem dependências.
+# Cada worker do gunicorn exporta os próprios valores (rótulo "worker" com o
+# pid), e o Prometheus soma as séries. Também mantém, opcionalmente, os perfis
+# cProfile das requisições mais lentas (PERFIL_LENTAS=N).
+
+logger = logging.getLogger('metricas')
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registro = []
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(nomes, valores, extra=()):
+    pares = list(zip(nomes, valores)) + list(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{n}="{_escapar(v)}"' for n, v in pares) + '}'
+
+
+class Contador:
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def inc(self, valor=1, **rotulos):
+        chave = tuple(str(rotulos.get(r, '')) for r in self.rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def exportar(self, fixos):
+        yield f'# HELP {self.nome} {self.ajuda}'
+        yield f'# TYPE {self.nome} counter'
+        with self._lock:
+            itens = list(self._valores.items())
+        for chave, valor in itens:
+            yield f'{self.nome}{_rotulos(self.rotulos, chave, fixos)} {valor}'
+
+
+class Histograma:
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # rótulos -> [contagens por bucket..., soma, total]
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def observar(self, segundos, **rotulos):
+        chave = tuple(str(rotulos.get(r, '')) for r in self.rotulos)
+        indice = bisect.bisect_left(self.buckets, segundos)
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            serie[indice] += 1
+            serie[-2] += segundos
+            serie[-1] += 1
+
+    def exportar(self, fixos):
+        yield f'# HELP {self.nome} {self.ajuda}'
+        yield f'# TYPE {self.nome} histogram'
+        with self._lock:
+            series = [(chave, list(serie)) for chave, serie in self._series.items()]
+        for chave, serie in series:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets + (float('inf'),), serie):
+                acumulado += contagem
+                le = '+Inf' if limite == float('inf') else repr(limite)
+                yield f'{self.nome}_bucket{_rotulos(self.rotulos, chave, fixos + (("le", le),))} {acumulado}'
+            yield f'{self.nome}_sum{_rotulos(self.rotulos, chave, fixos)} {serie[-2]}'
+            yield f'{self.nome}_count{_rotulos(self.rotulos, chave, fixos)} {serie[-1]}'
+
+
+@contextmanager
+def medir(histograma, **rotulos):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        histograma.observar(time.perf_counter() - inicio, **rotulos)
+
+
+def exportar():
+    fixos = (('worker', os.getpid()),)
+    linhas = [linha for metrica in _registro for linha in metrica.exportar(fixos)]
+    return '\n'.join(linhas) + '\n'
+
+
+HTTP = Histograma('lorena_http_requisicao_segundos', 'Latência das requisições por rota', ('rota', 'metodo', 'status'))
+HTTP_ERROS = Contador('lorena_http_erros_total', 'Exceções tratadas ou não por rota', ('rota',))
+SUPABASE = Histograma('lorena_supabase_consulta_segundos', 'Latência das consultas ao Supabase', ('consulta', 'ok'))
+TEMPLATE = Histograma('lorena_template_render_segundos', 'Tempo de render_template', ('template',))
+PDF_BUILD = Histograma('lorena_pdf_build_segundos', 'Tempo do doc.build do ReportLab (renderizações no processo do worker)')
+SENHA = Histograma('lorena_senha_hash_segundos', 'Tempo de geração/verificação de hash de senha', ('operacao',),
+                   buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+
+def registrar_erro(rota=None):
+    """Conta e registra no log a exceção em tratamento (para os except que devolvem uma resposta)."""
+    rota = rota or (request.url_rule.rule if request and request.url_rule else 'desconhecida')
+    HTTP_ERROS.inc(rota=rota)
+    logger.exception('erro em %s', rota)
+
+
+# ============== PERFIS DAS REQUISIÇÕES MAIS LENTAS ==============
+
+class Perfilador:
+    def __init__(self, lentas=0, amostra=0.1, diretorio=None):
+        self.lentas = lentas
+        self.amostra = amostra
+        self.diretorio = diretorio
+        self._piores = []  # heap mínimo de (segundos, seq, registro)
+        self._seq = itertools.count()
+        self._ativo = threading.Lock()  # um perfil por vez por processo
+        self._lock = threading.Lock()
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    @property
+    def ligado(self):
+        return self.lentas > 0
+
+    def iniciar(self):
+        if not self.ligado or random.random() >= self.amostra:
+            return None
+        if not self._ativo.acquire(blocking=False):
+            return None
+        perfil = cProfile.Profile()
+        perfil.enable()
+        return perfil
+
+    def finalizar(self, perfil, segundos, descricao):
+        perfil.disable()
+        self._ativo.release()
+        with self._lock:
+            if len(self._piores) >= self.lentas and segundos <= self._piores[0][0]:
+                return
+        saida = io.StringIO()
+        pstats.Stats(perfil, stream=saida).sort_stats('cumulative').print_stats(40)
+        registro = {'segundos': round(segundos, 4), 'requisicao': descricao,
+                    'quando': time.strftime('%Y-%m-%dT%H:%M:%S'), 'stats': saida.getvalue()}
+        if self.diretorio:
+            # .prof compatível com snakeviz/flameprof/gprof2dot para gerar flamegraphs
+            nome = f"{int(segundos * 1000):06d}ms_{os.getpid()}_{next(self._seq)}.prof"
+            perfil.dump_stats(os.path.join(self.diretorio, nome))
+            registro['arquivo'] = nome
+        with self._lock:
+            item = (segundos, next(self._seq), registro)
+            if len(self._piores) < self.lentas:
+                heapq.heappush(self._piores, item)
+            else:
+                heapq.heappushpop(self._piores, item)
+
+    def piores(self):
+        with self._lock:
+            return [r for _, _, r in sorted(self._piores, reverse=True)]
+
+
+perfilador = Perfilador(
+    lentas=int(os.getenv("PERFIL_LENTAS", "0")),
+    amostra=float(os.getenv("PERFIL_AMOSTRA", "0.1")),
+    diretorio=os.getenv("PERFIL_DIR") or None
+)
+
+
+# ============== INTEGRAÇÃO COM O FLASK ==============
+
+def _antes():
+    g._metricas_inicio = time.perf_counter()
+    g._perfil = perfilador.iniciar()
+
+
+def _depois(resposta):
+    inicio = g.pop('_metricas_inicio', None)
+    if inicio is not None:
+        segundos = time.perf_counter() - inicio
+        rota = request.url_rule.rule if request.url_rule else 'sem_rota'
+        HTTP.observar(segundos, rota=rota, metodo=request.method, status=resposta.status_code)
+        perfil = g.pop('_perfil', None)
+        if perfil is not None:
+            perfilador.finalizar(perfil, segundos, f'{request.method} {request.full_path.rstrip("?")}')
+    return resposta
+
+
+def _encerrar(erro):
+    # Exceção não tratada: after_request não roda, então fecha aqui
+    if erro is not None:
+        HTTP_ERROS.inc(rota=request.url_rule.rule if request.url_rule else 'sem_rota')
+    perfil = g.pop('_perfil', None)
+    if perfil is not None:
+        perfil.disable()
+        perfilador._ativo.release()
+
+
+def _antes_template(sender, template, context, **extra):
+    g.setdefault('_templates', []).append(time.perf_counter())
+
+
+def _template_renderizado(sender, template, context, **extra):
+    pilha = g.get('_templates')
+    if pilha:
+        TEMPLATE.observar(time.perf_counter() - pilha.pop(), template=template.name)
+
+
+def _observar_supabase(nome, segundos, ok):
+    SUPABASE.observar(segundos, consulta=nome, ok=str(ok).lower())
+
+
+def _autorizado():
+    # Sem METRICS_TOKEN as rotas ficam desligadas (404): rotas, tempos e
+    # perfis não vazam por esquecimento de configuração
+    token = os.getenv("METRICS_TOKEN")
+    if not token:
+        abort(404)
+    recebido = request.headers.get('Authorization', '').encode('utf-8', 'replace')
+    return hmac.compare_digest(recebido, f'Bearer {token}'.encode('utf-8'))
+
+
+def instalar(app, observadores_supabase):
+    """Registra os hooks no app, o observador das consultas e as rotas /metrics e /debug/perfis."""
+    app.before_request(_antes)
+    app.after_request(_depois)
+    app.teardown_request(_encerrar)
+    before_render_template.connect(_antes_template, app)
+    template_rendered.connect(_template_renderizado, app)
+    if _observar_supabase not in observadores_supabase:
+        observadores_supabase.append(_observar_supabase)
+
+    @app.route('/metrics')
+    def metrics():
+        if not _autorizado():
+            return Response('não autorizado\n', status=401)
+        return Response(exportar(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/debug/perfis')
+    def perfis():
+        if not _autorizado():
+            return Response('não autorizado\n', status=401)
+        if not perfilador.ligado:
+            return Response('perfilador desligado (defina PERFIL_LENTAS)\n', mimetype='text/plain')
+        partes = [f"=== {p['segundos']}s {p['requisicao']} ({p['quando']}) {p.get('arquivo', '')}\n{p['stats']}"
+                  for p in perfilador.piores()]
+        return Response('\n'.join(partes) or 'nenhum perfil ainda\n', mimetype='text/plain')
@@ -0,0 +1,46 @@
+import itertools
+import os
+import secrets
+import threading
+from datetime import datetime
+
+# Números de orçamento únicos entre workers e processos, sem ida ao banco.
+#
+#   PER-20250102153045-1Z141Z300042
+#       data e hora    nó (7) + contador (5), em base 36
+#
+# O prefixo com data/hora mantém a ordenação e a leitura humana. O sufixo
+# junta um identificador aleatório de 32 bits do processo (renovado a cada
+# fork, então cada worker do gunicorn tem o seu) e um contador local.
+
+_ALFABETO = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+_BITS_CONTADOR = 24
+
+_lock = threading.Lock()
+_no = None
+_contador = None
+
+
+def _base36(valor, largura):
+    digitos = []
+    for _ in range(largura):
+        valor, resto = divmod(valor, 36)
+        digitos.append(_ALFABETO[resto])
+    return ''.join(reversed(digitos))
+
+
+def _reiniciar():
+    global _no, _contador
+    _no = _base36(secrets.randbits(32), 7)
+    _contador = itertools.count(secrets.randbelow(1 << 16))
+
+
+_reiniciar()
+os.register_at_fork(after_in_child=_reiniciar)
+
+
+def gerar_numero(agora=None):
+    agora = agora or datetime.now()
+    with _lock:
+        sequencia = next(_contador) % (1 << _BITS_CONTADOR)
+    return f"PER-{agora.strftime('%Y%m%d%H%M%S')}-{_no}{_base36(sequencia, 5)}"
@@ -0,0 +1,106 @@
+import dados
+import estatisticas
+from orcamentos import CAMPOS_INT, montar_orcamento, payload_completo, recalculavel
+from precificacao import ErroPrecificacao, taxa_sugerida
+
+# Operações sobre vários orçamentos do histórico em uma requisição: excluir,
+# duplicar (com números novos) e reprecificar (nova taxa horária e/ou graus de
+# ajuste). Cada operação é uma leitura e uma única escrita em lote no Supabase,
+# e o resultado vem por id, na ordem pedida.
+
+OPERACOES = ('excluir', 'duplicar', 'reprecificar')
+
+# Campos aceitos em "valores" na reprecificação
+CAMPOS_REPRECIFICAR = ('taxa_horaria',) + CAMPOS_INT
+
+
+def _resultados(ids, por_id):
+    return [por_id.get(id_) or {'id': id_, 'ok': False, 'erro': 'Orçamento não encontrado'} for id_ in ids]
+
+
+def excluir(usuario_id, ids):
+    removidos = dados.deletar_orcamentos(usuario_id, ids)
+    estatisticas.registrar(removidos, sinal=-1)
+    return _resultados(ids, {o['id']: {'id': o['id'], 'ok': True} for o in removidos})
+
+
+def duplicar(usuario_id, ids):
+    originais = dados.buscar_orcamentos(usuario_id, ids=ids, limite=len(ids))
+    por_id = {o['id']: o for o in originais}
+    ordem = [id_ for id_ in ids if id_ in por_id]
+    # Mesmos valores do original (sem recalcular), com número novo
+    copias = [montar_orcamento(payload_completo(por_id[id_]), usuario_id, recalcular=False) for id_ in ordem]
+    novas = (dados.inserir_orcamentos(copias, retornar=True).data or []) if copias else []
+    estatisticas.registrar(novas)
+    return _resultados(ids, {
+        id_: {'id': id_, 'ok': True, 'novo_id': nova['id'], 'numero': nova['numero']}
+        for id_, nova in zip(ordem, novas)
+    })
+
+
+def _valores_reprecificar(valores, usuario_id):
+    novos = {}
+    if valores.get('taxa_pelos_custos'):
+        novos['taxa_horaria'] = taxa_sugerida(dados.buscar_custos_fixos(usuario_id))
+        if novos['taxa_horaria'] <= 0:
+            raise ErroPrecificacao('Cadastre os custos fixos para usar a taxa sugerida')
+    for campo in CAMPOS_REPRECIFICAR:
+        if valores.get(campo) is None or campo in novos:
+            continue
+        try:
+            novos[campo] = float(valores[campo]) if campo == 'taxa_horaria' else int(valores[campo])
+        except (TypeError, ValueError):
+            raise ErroPrecificacao(f'{campo}: valor inválido')
+        if novos[campo] < 0:
+            raise ErroPrecificacao(f'{campo}: valor negativo')
+    if not novos:
+        raise ErroPrecificacao('Informe taxa_horaria, taxa_pelos_custos ou algum grau de ajuste')
+    return novos
+
+
+def reprecificar(usuario_id, ids, valores):
+    novos = _valores_reprecificar(valores, usuario_id)
+    antigos = dados.buscar_orcamentos(usuario_id, ids=ids, limite=len(ids))
+    linhas, ignorados = [], {}
+    for antigo in antigos:
+        payload = payload_completo(antigo)
+        payload.update(novos)
+        # Mesma regra da importação: sem taxa e horas positivas o cálculo
+        # zeraria o total informado (orçamentos importados de planilhas antigas)
+        if not recalculavel(payload):
+            ignorados[antigo['id']] = {
+                'id': antigo['id'], 'ok': False,
+                'erro': 'Orçamento sem taxa horária e horas de análise positivas; não pode ser reprecificado',
+            }
+            continue
+        linha = montar_orcamento(payload, usuario_id, numero=antigo['numero'])
+        linha['id'] = antigo['id']
+        linhas.append(linha)
+    atualizados = dados.atualizar_orcamentos(usuario_id, linhas) if linhas else []
+
+    por_id = {o['id']: o for o in antigos}
+    estatisticas.registrar(atualizados, anteriores=[por_id[o['id']] for o in atualizados])
+    return _resultados(ids, {
+        **ignorados,
+        **{o['id']: {'id': o['id'], 'ok': True, 'valor_total_anterior': por_id[o['id']]['valor_total'],
+                     'valor_total': o['valor_total']}
+           for o in atualizados},
+    })
+
+
+def executar(operacao, usuario_id, ids, valores=None):
+    """Roda a operação e devolve {'operacao', 'total', 'ok', 'resultados': [...por id]}."""
+    if operacao == 'excluir':
+        resultados = excluir(usuario_id, ids)
+    elif operacao == 'duplicar':
+        resultados = duplicar(usuario_id, ids)
+    elif operacao == 'reprecificar':
+        resultados = reprecificar(usuario_id, ids, valores or {})
+    else:
+        raise ValueError(f"operacao deve ser uma de: {', '.join(OPERACOES)}")
+    return {
+        'operacao': operacao,
+        'total': len(resultados),
+        'ok': sum(1 for r in resultados if r['ok']),
+        'resultados': resultados,
+    }
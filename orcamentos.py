@@ -0,0 +1,152 @@
+import base64
+import json
+import os
+import zlib
+
+from numeracao import gerar_numero
+from paginacao import indice_busca
+from precificacao import recalcular_orcamento
+
+# Montagem da linha de lorena-orcamentos a partir do payload da calculadora.
+# Usado pelo /api/salvar-orcamento e pela importação em lote.
+
+CAMPOS_FLOAT = ('valor_base', 'horas_analise', 'valor_ajustado', 'taxa_horaria',
+                'custo_horas_analise', 'subtotal_fixo', 'valor_total')
+CAMPOS_INT = ('grau_urgencia', 'grau_especificidade', 'grau_complexidade')
+CAMPOS_JSON = ('ajustes', 'opcoes_pagamento')
+
+# Campos do payload que já têm coluna própria
+CAMPOS_PAYLOAD = ('nome_cliente', 'telefone_cliente', 'tipo_servico', 'observacoes') + CAMPOS_FLOAT + CAMPOS_INT + CAMPOS_JSON
+COLUNAS = CAMPOS_PAYLOAD + ('id', 'usuario_id', 'numero', 'created_at', 'busca', 'dados_completos')
+
+# Formato de dados_completos. Guarda só os campos do payload sem coluna:
+#   None            nenhum campo extra
+#   '2:{...}'       JSON dos extras
+#   '2z:<base64>'   JSON dos extras com zlib (ORCAMENTO_COMPRIMIR=1, quando fica menor)
+#   '{...}'         formato antigo: payload inteiro repetido (ver compactacao.py)
+VERSAO = '2'
+COMPRIMIR = os.getenv("ORCAMENTO_COMPRIMIR", "0") == "1"
+
+
+def _positivo(valor):
+    try:
+        return float(valor) > 0
+    except (TypeError, ValueError):
+        return False
+
+
+def recalculavel(data):
+    """True se o total pode ser recalculado: taxa horária e horas positivas.
+
+    Planilhas antigas nem sempre têm horas/valor-hora; sem eles o cálculo
+    zeraria o total informado. O teste é pelo valor numérico ("0" é texto
+    não vazio).
+    """
+    return _positivo(data.get('taxa_horaria')) and _positivo(data.get('horas_analise'))
+
+
+def montar_orcamento(data, usuario_id, numero=None, recalcular=True):
+    """Aplica as coerções de tipo e devolve a linha pronta para o insert."""
+    if recalcular:
+        # Valores recalculados no servidor (não confiar no total enviado pelo navegador)
+        data.update(recalcular_orcamento(data))
+
+    linha = {
+        'usuario_id': usuario_id,
+        'numero': numero or gerar_numero(),
+        'nome_cliente': data.get('nome_cliente'),
+        'telefone_cliente': data.get('telefone_cliente'),
+        'tipo_servico': data.get('tipo_servico'),
+        'valor_base': float(data.get('valor_base', 0)),
+        'horas_analise': float(data.get('horas_analise', 0)),
+        'grau_urgencia': int(data.get('grau_urgencia', 0)),
+        'grau_especificidade': int(data.get('grau_especificidade', 0)),
+        'grau_complexidade': int(data.get('grau_complexidade', 0)),
+        'ajustes': json.dumps(data.get('ajustes', [])),
+        'valor_ajustado': float(data.get('valor_ajustado', 0)),
+        'taxa_horaria': float(data.get('taxa_horaria', 0)),
+        'custo_horas_analise': float(data.get('custo_horas_analise', 0)),
+        'subtotal_fixo': float(data.get('subtotal_fixo', 0)),
+        'valor_total': float(data.get('valor_total', 0)),
+        'opcoes_pagamento': json.dumps(data.get('opcoes_pagamento', [])),
+        'observacoes': data.get('observacoes'),
+        'busca': indice_busca(data),
+    }
+    linha['dados_completos'] = compactar_dados(data)
+    return linha
+
+
+def compactar_dados(data, comprimir=None):
+    """Valor de dados_completos para o payload: só os campos que as colunas não guardam."""
+    extras = {campo: valor for campo, valor in data.items() if campo not in COLUNAS}
+    if not extras:
+        return None
+    bruto = json.dumps(extras, ensure_ascii=False, separators=(',', ':'), default=str)
+    texto = f'{VERSAO}:{bruto}'
+    if comprimir is None:
+        comprimir = COMPRIMIR
+    if comprimir:
+        comprimido = f'{VERSAO}z:' + base64.b64encode(zlib.compress(bruto.encode('utf-8'), 9)).decode('ascii')
+        if len(comprimido) < len(texto.encode('utf-8')):
+            return comprimido
+    return texto
+
+
+def compacto(valor):
+    return valor is None or (isinstance(valor, str) and valor.startswith(VERSAO))
+
+
+def _decodificar_dados(valor):
+    if valor.startswith(f'{VERSAO}z:'):
+        return json.loads(zlib.decompress(base64.b64decode(valor[len(VERSAO) + 2:])))
+    if valor.startswith(f'{VERSAO}:'):
+        return json.loads(valor[len(VERSAO) + 1:])
+    return json.loads(valor)
+
+
+def ler_dados_completos(valor, estrito=False):
+    """Conteúdo de dados_completos em dict, em qualquer dos formatos.
+
+    Linhas antigas podem ter JSON inválido ou que não é objeto; a leitura
+    trata esses casos como sem extras ({}), para não derrubar a rota inteira.
+    Com estrito=True (compactação) levanta ValueError/TypeError.
+    """
+    if not valor:
+        return {}
+    if isinstance(valor, dict):
+        return valor
+    try:
+        dados = _decodificar_dados(valor)
+        if not isinstance(dados, dict):
+            raise TypeError('dados_completos não é um objeto JSON')
+    except (ValueError, TypeError, zlib.error):
+        if estrito:
+            raise
+        return {}
+    return dados
+
+
+def _json(valor):
+    return json.loads(valor) if isinstance(valor, str) else valor
+
+
+def payload_completo(linha):
+    """Reconstrói o payload salvo a partir das colunas e dos extras."""
+    # Extras (ou o payload inteiro, no formato antigo) com as colunas por cima:
+    # os valores das colunas são os oficiais
+    payload = dict(ler_dados_completos(linha.get('dados_completos')))
+    payload.update({campo: linha.get(campo) for campo in CAMPOS_PAYLOAD})
+    for campo in CAMPOS_JSON:
+        payload[campo] = _json(payload[campo]) or []
+    return payload
+
+
+def ler_orcamento(linha):
+    """Linha para a API: ajustes e opções de pagamento decodificados e o payload completo."""
+    orcamento = dict(linha)
+    for campo in CAMPOS_JSON:
+        if campo in orcamento:
+            orcamento[campo] = _json(orcamento[campo]) or []
+    if 'dados_completos' in orcamento:
+        orcamento['dados_completos'] = payload_completo(linha)
+    return orcamento
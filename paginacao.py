@@ -0,0 +1,71 @@
+import base64
+import unicodedata
+from datetime import datetime
+
+import dados
+
+# Paginação por cursor (keyset) do histórico de orçamentos.
+# Ordena por (created_at desc, id desc) e usa a última linha da página como
+# cursor, então cada página custa o mesmo independente da profundidade.
+
+# Projeção enxuta para listagens (sem dados_completos)
+COLUNAS_LISTA = 'id, numero, nome_cliente, tipo_servico, valor_total, created_at'
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def normalizar_busca(texto):
+    # Minúsculas e sem acentos, no mesmo formato da coluna `busca`
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def indice_busca(orcamento):
+    return normalizar_busca(f"{orcamento.get('nome_cliente') or ''} {orcamento.get('tipo_servico') or ''}")
+
+
+def codificar_cursor(linha):
+    bruto = f"{linha['created_at']}|{linha['id']}"
+    return base64.urlsafe_b64encode(bruto.encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor(cursor):
+    # O created_at vai para o filtro do PostgREST: só passa uma data válida,
+    # reserializada, nunca o texto vindo do cliente
+    try:
+        created_at, id_ = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return datetime.fromisoformat(created_at).isoformat(), int(id_)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def buscar_pagina(usuario_id, cursor=None, termo=None, limite=20):
+    """Retorna (linhas, próximo cursor ou None); CursorInvalido se o cursor não decodificar."""
+    query = dados.tabela(dados.TABELA_ORCAMENTOS).select(COLUNAS_LISTA).eq('usuario_id', usuario_id)
+
+    termo = normalizar_busca(termo)
+    if termo:
+        # Escapa os curingas do LIKE digitados pelo usuário
+        termo = termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query = query.ilike('busca', f"%{termo}%")
+
+    if cursor is not None:
+        # Cursor ilegível não volta para a primeira página (a rolagem duplicaria os cards)
+        posicao = decodificar_cursor(cursor)
+        if posicao is None:
+            raise CursorInvalido('cursor inválido')
+        created_at, id_ = posicao
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{id_})')
+
+    # Uma linha a mais indica se existe próxima página
+    query = query.order('created_at', desc=True).order('id', desc=True).limit(limite + 1)
+    linhas = dados.executar(query, 'orcamentos.pagina', tentativas=dados.TENTATIVAS_LEITURA).data or []
+
+    proximo = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo = codificar_cursor(linhas[-1])
+    return linhas, proximo
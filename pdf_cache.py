@@ -0,0 +1,185 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Cache de bytes dos PDFs já renderizados.
+# A chave é o hash da linha do orçamento + dados do usuário impressos no PDF,
+# então qualquer alteração gera uma chave nova. As invalidações explícitas
+# (exclusão do orçamento, alteração do perfil) só liberam espaço mais cedo.
+
+CAMPOS_USUARIO = ('nome_completo', 'numero_crp', 'email', 'telefone')
+
+# Poda do disco: o total é estimado em memória (cada worker soma as próprias
+# gravações) e o diretório só é varrido quando a estimativa passa do limite
+# ou a cada PODA_A_CADA gravações, para contar as dos outros workers. A poda
+# desce a PODA_ALVO do limite, para a gravação seguinte não varrer de novo.
+PODA_A_CADA = 100
+PODA_ALVO = 0.9
+
+
+def chave_pdf(orcamento, user):
+    payload = {
+        'orcamento': orcamento,
+        'usuario': {campo: user.get(campo) for campo in CAMPOS_USUARIO},
+    }
+    bruto = json.dumps(payload, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(bruto.encode('utf-8')).hexdigest()
+
+
+def nome_arquivo(orcamento):
+    return f"Proposta_Valora_{orcamento.get('numero', 'doc')}.pdf"
+
+
+class PdfCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, diretorio=None, max_bytes_disco=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.diretorio = diretorio
+        self.max_bytes_disco = max_bytes_disco
+        self.hits = 0
+        self.misses = 0
+        self._itens = OrderedDict()  # chave -> (usuario_id, orcamento_id, bytes)
+        self._total = 0
+        self._lock = threading.Lock()
+        self._disco_total = None  # estimativa; None até a primeira varredura
+        self._gravacoes = 0
+        self._lock_disco = threading.Lock()
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    # --- memória ---
+
+    def _guardar_memoria(self, chave, usuario_id, orcamento_id, dados):
+        if len(dados) > self.max_bytes:
+            return
+        with self._lock:
+            antigo = self._itens.pop(chave, None)
+            if antigo:
+                self._total -= len(antigo[2])
+            self._itens[chave] = (usuario_id, orcamento_id, dados)
+            self._total += len(dados)
+            # Evicção LRU até caber no limite
+            while self._total > self.max_bytes:
+                _, (_, _, removido) = self._itens.popitem(last=False)
+                self._total -= len(removido)
+
+    def _remover_memoria(self, filtro):
+        with self._lock:
+            for chave in [c for c, item in self._itens.items() if filtro(item)]:
+                self._total -= len(self._itens.pop(chave)[2])
+
+    # --- disco (compartilhado entre os workers do gunicorn) ---
+
+    def _caminho(self, usuario_id, orcamento_id, chave):
+        return os.path.join(self.diretorio, f"{usuario_id}_{orcamento_id}_{chave}.pdf")
+
+    def _ler_disco(self, usuario_id, orcamento_id, chave):
+        caminho = self._caminho(usuario_id, orcamento_id, chave)
+        try:
+            with open(caminho, 'rb') as f:
+                dados = f.read()
+            os.utime(caminho)
+            return dados
+        except OSError:
+            return None
+
+    def _gravar_disco(self, usuario_id, orcamento_id, chave, dados):
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(dados)
+            os.replace(tmp, self._caminho(usuario_id, orcamento_id, chave))
+        except OSError:
+            return
+        with self._lock_disco:
+            self._gravacoes += 1
+            if self._disco_total is not None:
+                self._disco_total += len(dados)
+            if (self._disco_total is None or self._disco_total > self.max_bytes_disco
+                    or self._gravacoes % PODA_A_CADA == 0):
+                self._disco_total = self._podar_disco()
+
+    def _podar_disco(self):
+        """Varre o diretório, remove os mais antigos se passar do limite e devolve o total."""
+        arquivos = []
+        total = 0
+        for caminho in glob.glob(os.path.join(self.diretorio, '*.pdf')):
+            try:
+                st = os.stat(caminho)
+            except OSError:
+                continue
+            arquivos.append((st.st_mtime, st.st_size, caminho))
+            total += st.st_size
+        if total <= self.max_bytes_disco:
+            return total
+        arquivos.sort()
+        alvo = self.max_bytes_disco * PODA_ALVO
+        for _, tamanho, caminho in arquivos:
+            if total <= alvo:
+                break
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+            total -= tamanho
+        return total
+
+    def _remover_disco(self, padrao):
+        for caminho in glob.glob(os.path.join(self.diretorio, padrao)):
+            try:
+                os.remove(caminho)
+            except OSError:
+                pass
+
+    # --- API pública ---
+
+    def get(self, chave, usuario_id, orcamento_id):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item:
+                self._itens.move_to_end(chave)
+                self.hits += 1
+                return item[2]
+
+        if self.diretorio:
+            dados = self._ler_disco(usuario_id, orcamento_id, chave)
+            if dados is not None:
+                self._guardar_memoria(chave, usuario_id, orcamento_id, dados)
+                with self._lock:
+                    self.hits += 1
+                return dados
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, chave, usuario_id, orcamento_id, dados):
+        self._guardar_memoria(chave, usuario_id, orcamento_id, dados)
+        if self.diretorio:
+            self._gravar_disco(usuario_id, orcamento_id, chave, dados)
+
+    def invalidar_orcamento(self, usuario_id, orcamento_id):
+        self._remover_memoria(lambda item: item[0] == usuario_id and item[1] == orcamento_id)
+        if self.diretorio:
+            self._remover_disco(f"{usuario_id}_{orcamento_id}_*.pdf")
+
+    def invalidar_usuario(self, usuario_id):
+        self._remover_memoria(lambda item: item[0] == usuario_id)
+        if self.diretorio:
+            self._remover_disco(f"{usuario_id}_*.pdf")
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'itens': len(self._itens),
+                'bytes': self._total,
+                'max_bytes': self.max_bytes,
+                'diretorio': self.diretorio,
+            }
@@ -0,0 +1,247 @@
+import os
+import time
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+from types import SimpleNamespace
+
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_RIGHT, TA_JUSTIFY
+
+from metricas import PDF_BUILD
+
+# Motor de renderização das propostas em PDF.
+# Tudo que não depende do orçamento (estilos, TableStyles, rodapé e a logo já
+# decodificada) é montado uma única vez por worker em _recursos().
+
+# Streams binários (só zlib). Sem a extensão C do rl_accel, a codificação
+# ASCII85 em Python puro da logo era o maior custo de cada PDF.
+rl_config.useA85 = 0
+
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'logo.png')
+
+COLOR_PRIMARY = colors.HexColor('#059669')
+COLOR_DARK = colors.HexColor('#111827')
+COLOR_GRAY = colors.HexColor('#6b7280')
+COLOR_BORDER = colors.HexColor('#e5e7eb')
+COLOR_FOOTER = colors.HexColor('#9ca3af')
+COLOR_TOTAL_BG = colors.HexColor('#ecfdf5')
+
+# Template dos blocos das partes: (rótulo, campo, valor padrão).
+# None no rótulo indica uma linha extra de valor sem rótulo.
+BLOCO_PROFISSIONAL = [
+    ("Nome Completo:", 'nome_completo', ''),
+    ("Registro (CRP):", 'numero_crp', 'Não informado'),
+    ("Contato:", 'email', ''),
+    (None, 'telefone', ''),
+]
+
+BLOCO_CLIENTE = [
+    ("Nome / Responsável:", 'nome_cliente', ''),
+    ("Telefone:", 'telefone_cliente', 'Não informado'),
+    ("Serviço:", 'tipo_servico', ''),
+]
+
+
+class _Logo(Image):
+    # Image do platypus que reaproveita o ImageReader já decodificado
+    def __init__(self, leitor, width, height):
+        self._img = leitor
+        super().__init__(LOGO_PATH, width=width, height=height, kind='proportional', hAlign='LEFT')
+
+
+def _footer_bg(canvas, doc):
+    canvas.saveState()
+    canvas.setStrokeColor(COLOR_BORDER)
+    canvas.setLineWidth(0.5)
+    canvas.line(20*mm, 15*mm, 190*mm, 15*mm)
+    canvas.setFont('Helvetica', 8)
+    canvas.setFillColor(COLOR_FOOTER)
+    canvas.drawString(20*mm, 10*mm, "VALORA - Soluções em Psicologia e Perícia")
+    canvas.drawRightString(190*mm, 10*mm, f"Página {canvas.getPageNumber()}")
+    canvas.restoreState()
+
+
+@lru_cache(maxsize=1)
+def _recursos():
+    styles = getSampleStyleSheet()
+
+    r = SimpleNamespace()
+    r.style_title = ParagraphStyle('DocTitle', parent=styles['Heading1'], fontSize=16, textColor=COLOR_DARK, alignment=TA_RIGHT, spaceAfter=2)
+    r.style_subtitle = ParagraphStyle('DocSub', parent=styles['Normal'], fontSize=10, textColor=COLOR_PRIMARY, alignment=TA_RIGHT)
+    r.style_section = ParagraphStyle('Section', parent=styles['Heading2'], fontSize=12, textColor=COLOR_PRIMARY, spaceBefore=15, spaceAfter=8, textTransform='uppercase')
+    r.style_label = ParagraphStyle('Label', parent=styles['Normal'], fontSize=9, textColor=COLOR_GRAY, leading=11)
+    r.style_value = ParagraphStyle('Value', parent=styles['Normal'], fontSize=10, textColor=COLOR_DARK, leading=12, fontName='Helvetica-Bold')
+    r.style_normal = ParagraphStyle('NormalText', parent=styles['Normal'], fontSize=10, textColor=COLOR_DARK, leading=14, alignment=TA_JUSTIFY)
+    r.style_date = ParagraphStyle('Date', parent=styles['Normal'], alignment=TA_RIGHT, fontSize=9, textColor=COLOR_GRAY)
+
+    r.ts_header = TableStyle([
+        ('VALIGN', (0,0), (-1,-1), 'TOP'),
+        ('ALIGN', (1,0), (1,0), 'RIGHT'),
+        ('LEFTPADDING', (0,0), (-1,-1), 0),
+        ('RIGHTPADDING', (0,0), (-1,-1), 0),
+    ])
+    r.ts_divisor = TableStyle([('LINEBELOW', (0,0), (-1,-1), 1, COLOR_PRIMARY)])
+    r.ts_partes = TableStyle([
+        ('VALIGN', (0,0), (-1,-1), 'TOP'),
+        ('LEFTPADDING', (0,0), (-1,-1), 0),
+    ])
+    r.ts_financeiro = TableStyle([
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('TEXTCOLOR', (0,0), (-1,0), COLOR_PRIMARY),
+        ('FONTSIZE', (0,0), (-1,0), 9),
+        ('BOTTOMPADDING', (0,0), (-1,0), 8),
+        ('LINEBELOW', (0,0), (-1,0), 1, COLOR_PRIMARY),
+        ('FONTNAME', (0,1), (-1,-1), 'Helvetica'),
+        ('TEXTCOLOR', (0,1), (-1,-1), COLOR_DARK),
+        ('FONTSIZE', (0,1), (-1,-1), 10),
+        ('ALIGN', (1,0), (1,-1), 'RIGHT'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('TOPPADDING', (0,1), (-1,-1), 8),
+        ('BOTTOMPADDING', (0,1), (-1,-1), 8),
+        ('LINEBELOW', (0,1), (-1,-2), 0.5, COLOR_BORDER),
+    ])
+    r.ts_total = TableStyle([
+        ('BACKGROUND', (0,0), (-1,-1), COLOR_TOTAL_BG),
+        ('TEXTCOLOR', (0,0), (-1,-1), COLOR_PRIMARY),
+        ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,0), (-1,-1), 12),
+        ('ALIGN', (1,0), (1,0), 'RIGHT'),
+        ('TOPPADDING', (0,0), (-1,-1), 12),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 12),
+    ])
+
+    # Logo decodificada uma vez; cada PDF só recebe um novo flowable apontando para ela
+    r.logo = ImageReader(LOGO_PATH) if os.path.exists(LOGO_PATH) else None
+    if r.logo is not None:
+        # Decodifica já (pixels e canal alfa): a carga preguiçosa do PIL não é
+        # segura com várias threads renderizando ao mesmo tempo
+        r.logo.getRGBData()
+        r.logo.getTransparent()
+    return r
+
+
+def _data_emissao(orcamento):
+    try:
+        data_criacao = orcamento.get('created_at', datetime.now().isoformat())
+        return datetime.fromisoformat(data_criacao.replace('Z', '+00:00')).strftime('%d/%m/%Y')
+    except:
+        return datetime.now().strftime('%d/%m/%Y')
+
+
+def _bloco_partes(titulo, template, dados, r):
+    linhas = [[Paragraph(titulo, r.style_section)]]
+    for i, (rotulo, campo, padrao) in enumerate(template):
+        if rotulo is not None:
+            if i > 0:
+                linhas.append([Spacer(1, 3)])
+            linhas.append([Paragraph(rotulo, r.style_label)])
+        linhas.append([Paragraph(dados.get(campo) or padrao, r.style_value)])
+    return Table(linhas, colWidths=[80*mm])
+
+
+def _cabecalho(orcamento, r):
+    if r.logo is not None:
+        marca = _Logo(r.logo, width=45*mm, height=45*mm)
+    else:
+        marca = Paragraph("<b>VALORA</b>", r.style_section)
+
+    info_doc = [
+        Paragraph("PROPOSTA DE HONORÁRIOS", r.style_title),
+        Paragraph(f"Ref: {orcamento.get('numero', '---')}", r.style_subtitle),
+        Spacer(1, 5),
+        Paragraph(f"Emitido em: {_data_emissao(orcamento)}", r.style_date)
+    ]
+
+    return [
+        Table([[marca, info_doc]], colWidths=[85*mm, 85*mm], style=r.ts_header),
+        Spacer(1, 5*mm),
+        Table([['']], colWidths=[170*mm], style=r.ts_divisor),
+        Spacer(1, 10*mm),
+    ]
+
+
+def _partes(orcamento, user, r):
+    prof = _bloco_partes("PROFISSIONAL", BLOCO_PROFISSIONAL, user, r)
+    cliente = _bloco_partes("CLIENTE", BLOCO_CLIENTE, orcamento, r)
+    return [
+        Table([[prof, cliente]], colWidths=[85*mm, 85*mm], style=r.ts_partes),
+        Spacer(1, 15*mm),
+    ]
+
+
+def _financeiro(orcamento, r):
+    # Valores seguros (float)
+    try:
+        val_base = float(orcamento.get('valor_base', 0))
+        val_ajustado = float(orcamento.get('valor_ajustado', 0))
+        val_total = float(orcamento.get('valor_total', 0))
+        custo_hora = float(orcamento.get('custo_horas_analise', 0))
+    except ValueError:
+        val_base = val_ajustado = val_total = custo_hora = 0.0
+
+    f_data = [['Descrição do Serviço', 'Valor']]
+    f_data.append(['Valor Base Estimado', f"R$ {val_base:.2f}"])
+    f_data.append(['Custo Hora Técnica', f"R$ {custo_hora:.2f}"])
+
+    if val_ajustado and val_ajustado != val_base:
+        diferenca = val_ajustado - val_base
+        f_data.append(['Ajustes e Especificidades', f"R$ {diferenca:.2f}"])
+
+    return [
+        Paragraph("DETALHAMENTO DO INVESTIMENTO", r.style_section),
+        Spacer(1, 3*mm),
+        Table(f_data, colWidths=[130*mm, 40*mm], style=r.ts_financeiro),
+        Spacer(1, 2*mm),
+        Table([['TOTAL DO INVESTIMENTO', f"R$ {val_total:.2f}"]], colWidths=[130*mm, 40*mm], style=r.ts_total),
+    ]
+
+
+def gerar_pdf_proposta(orcamento, user):
+    """Renderiza a proposta de honorários e devolve os bytes do PDF."""
+    pdf_bytes, segundos = renderizar(orcamento, user)
+    PDF_BUILD.observar(segundos)
+    return pdf_bytes
+
+
+def renderizar(orcamento, user):
+    """(bytes do PDF, segundos do doc.build). Usado direto no pool de processos,
+    que devolve o tempo para o histograma ser registrado no worker."""
+    r = _recursos()
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        topMargin=25*mm,
+        bottomMargin=20*mm,
+        leftMargin=20*mm,
+        rightMargin=20*mm
+    )
+
+    elements = []
+    elements += _cabecalho(orcamento, r)
+    elements += _partes(orcamento, user, r)
+    elements += _financeiro(orcamento, r)
+
+    # --- OBSERVAÇÕES ---
+    obs = orcamento.get('observacoes')
+    if obs:
+        elements.append(Spacer(1, 15*mm))
+        elements.append(Paragraph("OBSERVAÇÕES", r.style_section))
+        elements.append(Paragraph(obs.replace('\n', '<br/>'), r.style_normal))
+
+    inicio = time.perf_counter()
+    doc.build(elements, onFirstPage=_footer_bg, onLaterPages=_footer_bg)
+    return buffer.getvalue(), time.perf_counter() - inicio
+
+
+def limpar_cache():
+    # Força a remontagem dos recursos (usado pelo benchmark para medir o custo "a frio")
+    _recursos.cache_clear()
@@ -0,0 +1,171 @@
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+# Motor de precificação (fonte oficial dos valores do orçamento).
+# Mesma fórmula do calculator.js:
+#   valor_horas = valor_hora × horas
+#   valor_total = valor_horas × (1 + (urgência + especificidade + complexidade) / 100)
+# Os lotes são calculados em uma única passada vetorizada com NumPy.
+
+CAMPOS = ('valor_hora', 'horas', 'grau_urgencia', 'grau_especificidade', 'grau_complexidade')
+
+AJUSTES = (
+    ('Urgência', 'grau_urgencia'),
+    ('Especificidade', 'grau_especificidade'),
+    ('Complexidade', 'grau_complexidade'),
+)
+
+# Limite de cenários por chamada (cenários explícitos ou combinações da grade)
+MAX_CENARIOS = 100_000
+
+
+class ErroPrecificacao(ValueError):
+    pass
+
+
+CAMPOS_CUSTOS = ('aluguel_consultorio', 'internet_telefonia', 'ferramentas_software',
+                 'anuidade_crp', 'funcionarios_salarios', 'outros_custos')
+
+ResumoCustos = namedtuple('ResumoCustos', 'total_mensal horas custo_hora')
+
+
+@lru_cache(maxsize=1024)
+def _resumo_custos(valores, horas):
+    total = sum(valores)
+    return ResumoCustos(total, horas, total / horas if horas > 0 else 0.0)
+
+
+def resumo_custos(custos):
+    """Total mensal, horas e custo por hora da linha de lorena-custos_fixos.
+    Memorizado pelos valores da linha: só recalcula quando os custos mudam."""
+    if not custos:
+        return ResumoCustos(0.0, 0.0, 0.0)
+    return _resumo_custos(
+        tuple(float(custos.get(campo) or 0) for campo in CAMPOS_CUSTOS),
+        float(custos.get('horas_trabalhadas_mes') or 0)
+    )
+
+
+def custo_hora(custos):
+    """Custo fixo por hora trabalhada a partir da linha de lorena-custos_fixos."""
+    return resumo_custos(custos).custo_hora
+
+
+# Mesmo fator da "sugestão baseada nos seus custos" do calculator.js
+FATOR_SUGESTAO = 5
+
+
+def taxa_sugerida(custos):
+    return round(custo_hora(custos) * FATOR_SUGESTAO, 2)
+
+
+def _validar(arrays):
+    for campo, valores in arrays.items():
+        if not np.all(np.isfinite(valores)):
+            raise ErroPrecificacao(f"{campo}: valor inválido")
+        if np.any(valores < 0):
+            raise ErroPrecificacao(f"{campo}: valor negativo")
+
+
+def calcular_lote(valor_hora, horas, grau_urgencia=0, grau_especificidade=0, grau_complexidade=0, custo_hora=0.0):
+    """Recebe escalares ou arrays (com broadcast) e devolve um dict de arrays."""
+    arrays = {
+        'valor_hora': np.asarray(valor_hora, dtype=np.float64),
+        'horas': np.asarray(horas, dtype=np.float64),
+        'grau_urgencia': np.asarray(grau_urgencia, dtype=np.float64),
+        'grau_especificidade': np.asarray(grau_especificidade, dtype=np.float64),
+        'grau_complexidade': np.asarray(grau_complexidade, dtype=np.float64),
+    }
+    _validar(arrays)
+
+    valor_horas = arrays['valor_hora'] * arrays['horas']
+    percentual = arrays['grau_urgencia'] + arrays['grau_especificidade'] + arrays['grau_complexidade']
+    ajuste = valor_horas * (percentual / 100)
+    valor_total = valor_horas + ajuste
+    custo_total = custo_hora * arrays['horas']
+
+    resultado = {campo: valores for campo, valores in arrays.items()}
+    resultado.update({
+        'valor_horas': valor_horas,
+        'percentual_ajustes': percentual,
+        'valor_ajustes': ajuste,
+        'valor_total': valor_total,
+        'custo_total': custo_total,
+        'lucro': valor_total - custo_total,
+    })
+    return {campo: np.broadcast_to(valores, valor_total.shape) for campo, valores in resultado.items()}
+
+
+def calcular_cenarios(cenarios, custo_hora=0.0):
+    """Lista de dicts (chaves de CAMPOS) -> dict de arrays na mesma ordem."""
+    if len(cenarios) > MAX_CENARIOS:
+        raise ErroPrecificacao(f"Máximo de {MAX_CENARIOS} cenários por chamada")
+    try:
+        colunas = {
+            campo: np.fromiter((float(c.get(campo) or 0) for c in cenarios), dtype=np.float64, count=len(cenarios))
+            for campo in CAMPOS
+        }
+    except (TypeError, ValueError, AttributeError):
+        raise ErroPrecificacao("Cenário inválido")
+    return calcular_lote(custo_hora=custo_hora, **colunas)
+
+
+def calcular_grade(grade, custo_hora=0.0):
+    """Produto cartesiano dos valores informados para cada campo (what-if)."""
+    eixos = []
+    for campo in CAMPOS:
+        valores = grade.get(campo, [0])
+        if not isinstance(valores, (list, tuple)):
+            valores = [valores]
+        try:
+            eixos.append(np.asarray(valores, dtype=np.float64))
+        except (TypeError, ValueError):
+            raise ErroPrecificacao(f"{campo}: valor inválido")
+
+    total = int(np.prod([len(e) for e in eixos]))
+    if total == 0:
+        raise ErroPrecificacao("Grade vazia")
+    if total > MAX_CENARIOS:
+        raise ErroPrecificacao(f"Máximo de {MAX_CENARIOS} combinações por chamada")
+
+    malha = np.meshgrid(*eixos, indexing='ij')
+    return calcular_lote(custo_hora=custo_hora, **{campo: m.ravel() for campo, m in zip(CAMPOS, malha)})
+
+
+def recalcular_orcamento(data):
+    """Valores oficiais de um orçamento a partir das entradas enviadas pelo navegador."""
+    valor_hora = float(data.get('taxa_horaria') or 0)
+    horas = float(data.get('horas_analise') or 0)
+    graus = {campo: int(data.get(campo) or 0) for _, campo in AJUSTES}
+
+    r = calcular_lote(valor_hora, horas, **graus)
+    valor_horas = float(r['valor_horas'])
+    valor_total = round(float(r['valor_total']), 2)
+
+    ajustes = [
+        {'tipo': tipo, 'percentual': graus[campo], 'valor': round(valor_horas * graus[campo] / 100, 2)}
+        for tipo, campo in AJUSTES if graus[campo] > 0
+    ]
+
+    return {
+        'valor_base': round(valor_horas, 2),
+        'horas_analise': horas,
+        'taxa_horaria': valor_hora,
+        'custo_horas_analise': round(valor_horas, 2),
+        'subtotal_fixo': round(valor_horas, 2),
+        'valor_ajustado': valor_total,
+        'valor_total': valor_total,
+        'ajustes': ajustes,
+        **graus,
+    }
+
+
+def para_json(resultado, campos=None, decimais=2):
+    # Colunas (listas) em vez de uma lista de objetos: bem mais barato para 10k+ linhas
+    if campos is None or campos == []:
+        campos = list(resultado)
+    elif not isinstance(campos, list) or not all(isinstance(c, str) and c in resultado for c in campos):
+        raise ErroPrecificacao(f"campos deve ser uma lista com: {', '.join(resultado)}")
+    return {campo: np.round(resultado[campo], decimais).tolist() for campo in campos}
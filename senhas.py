@@ -0,0 +1,69 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import metricas
+
+# Hash de senhas fora da thread da requisição, com controle de admissão.
+# scrypt/PBKDF2 do hashlib liberam o GIL, então o executor limita quantos
+# hashes rodam ao mesmo tempo por worker; acima de SENHA_FILA_MAX (em execução
+# + aguardando) a chamada espera no máximo SENHA_ESPERA segundos e desiste com
+# SenhaOcupada, em vez de empilhar requisições atrás de uma rajada de logins.
+
+# Política no formato do werkzeug: "scrypt", "scrypt:32768:8:1", "pbkdf2:sha256:600000"...
+METODO = os.getenv("SENHA_METODO", "scrypt")
+THREADS = int(os.getenv("SENHA_THREADS", "2"))
+FILA_MAX = int(os.getenv("SENHA_FILA_MAX", "16"))
+ESPERA = float(os.getenv("SENHA_ESPERA", "5"))
+
+REJEITADAS = metricas.Contador('lorena_senha_rejeitadas_total', 'Hashes de senha recusados por excesso de fila')
+
+_executor = None
+_executor_lock = threading.Lock()
+_vagas = threading.BoundedSemaphore(FILA_MAX)
+
+
+class SenhaOcupada(Exception):
+    pass
+
+
+def _pool():
+    # Criado sob demanda, depois do fork do gunicorn
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix='senha')
+        return _executor
+
+
+def _executar(operacao, funcao, *args):
+    if not _vagas.acquire(timeout=ESPERA):
+        REJEITADAS.inc()
+        raise SenhaOcupada('muitas operações de senha simultâneas')
+    try:
+        with metricas.medir(metricas.SENHA, operacao=operacao):
+            return _pool().submit(funcao, *args).result()
+    finally:
+        _vagas.release()
+
+
+def gerar_hash(senha):
+    return _executar('gerar', generate_password_hash, senha, METODO)
+
+
+def verificar(senha_hash, senha):
+    return _executar('verificar', check_password_hash, senha_hash, senha)
+
+
+@lru_cache(maxsize=1)
+def _prefixo_politica():
+    # Parâmetros completos da política (ex.: "scrypt" -> "scrypt:32768:8:1")
+    return generate_password_hash('', METODO).split('$', 1)[0]
+
+
+def precisa_atualizar(senha_hash):
+    """True se o hash guardado foi gerado com outra política (rehash no próximo login)."""
+    return senha_hash.split('$', 1)[0] != _prefixo_politica()
@@ -0,0 +1,20 @@
+-- Histórico paginado por cursor e busca no servidor
+-- Executar no SQL Editor do Supabase antes de publicar a versão correspondente.
+
+create extension if not exists pg_trgm;
+create extension if not exists unaccent;
+
+-- Índice de busca normalizado (minúsculas, sem acentos): "nome_cliente tipo_servico"
+alter table "lorena-orcamentos" add column if not exists busca text;
+
+update "lorena-orcamentos"
+   set busca = lower(unaccent(coalesce(nome_cliente, '') || ' ' || coalesce(tipo_servico, '')))
+ where busca is null;
+
+-- Paginação keyset: (usuario_id, created_at desc, id desc)
+create index if not exists "lorena-orcamentos_usuario_created_idx"
+    on "lorena-orcamentos" (usuario_id, created_at desc, id desc);
+
+-- ILIKE '%termo%' sobre a coluna normalizada
+create index if not exists "lorena-orcamentos_busca_trgm_idx"
+    on "lorena-orcamentos" using gin (busca gin_trgm_ops);
@@ -0,0 +1,119 @@
+-- Agregados por usuário, mês e tipo de serviço para o painel do dashboard.
+-- Mantidos incrementalmente pelo app (salvar, excluir e importar orçamentos),
+-- então o dashboard não precisa varrer lorena-orcamentos.
+
+create table if not exists "lorena-estatisticas_mensais" (
+    usuario_id          bigint  not null,
+    mes                 date    not null,
+    tipo_servico        text    not null default '',
+    quantidade          integer not null default 0,
+    soma_valor_total    numeric not null default 0,
+    soma_horas          numeric not null default 0,
+    soma_urgencia       numeric not null default 0,
+    soma_especificidade numeric not null default 0,
+    soma_complexidade   numeric not null default 0,
+    -- contagem por faixa do percentual total de ajustes: {"0": 3, "1-10": 5, ...}
+    faixas_ajuste       jsonb   not null default '{}'::jsonb,
+    primary key (usuario_id, mes, tipo_servico)
+);
+
+-- Soma (ou subtrai, com quantidade negativa) uma lista de deltas de forma atômica.
+-- p_itens: [{"usuario_id", "mes", "tipo_servico", "quantidade", "soma_valor_total",
+--            "soma_horas", "soma_urgencia", "soma_especificidade",
+--            "soma_complexidade", "faixas_ajuste"}]
+create or replace function lorena_acumular_estatisticas(p_itens jsonb)
+returns void
+language plpgsql
+as $$
+declare
+    item jsonb;
+begin
+    for item in select * from jsonb_array_elements(p_itens) loop
+        insert into "lorena-estatisticas_mensais" as e (
+            usuario_id, mes, tipo_servico, quantidade, soma_valor_total, soma_horas,
+            soma_urgencia, soma_especificidade, soma_complexidade, faixas_ajuste
+        ) values (
+            (item->>'usuario_id')::bigint,
+            (item->>'mes')::date,
+            coalesce(item->>'tipo_servico', ''),
+            (item->>'quantidade')::integer,
+            (item->>'soma_valor_total')::numeric,
+            (item->>'soma_horas')::numeric,
+            (item->>'soma_urgencia')::numeric,
+            (item->>'soma_especificidade')::numeric,
+            (item->>'soma_complexidade')::numeric,
+            coalesce(item->'faixas_ajuste', '{}'::jsonb)
+        )
+        on conflict (usuario_id, mes, tipo_servico) do update set
+            quantidade          = e.quantidade + excluded.quantidade,
+            soma_valor_total    = e.soma_valor_total + excluded.soma_valor_total,
+            soma_horas          = e.soma_horas + excluded.soma_horas,
+            soma_urgencia       = e.soma_urgencia + excluded.soma_urgencia,
+            soma_especificidade = e.soma_especificidade + excluded.soma_especificidade,
+            soma_complexidade   = e.soma_complexidade + excluded.soma_complexidade,
+            faixas_ajuste       = (
+                select coalesce(jsonb_object_agg(chave, total), '{}'::jsonb)
+                  from (
+                      select chave, sum(valor::integer) as total
+                        from (
+                            select key as chave, value as valor from jsonb_each_text(e.faixas_ajuste)
+                            union all
+                            select key, value from jsonb_each_text(excluded.faixas_ajuste)
+                        ) s
+                       group by chave
+                      having sum(valor::integer) <> 0
+                  ) t
+            );
+
+        -- Só a linha recém-atualizada pode ter zerado (usa a chave primária)
+        delete from "lorena-estatisticas_mensais"
+         where usuario_id = (item->>'usuario_id')::bigint
+           and mes = (item->>'mes')::date
+           and tipo_servico = coalesce(item->>'tipo_servico', '')
+           and quantidade <= 0;
+    end loop;
+end;
+$$;
+
+-- Recalcula do zero os agregados de um usuário (backfill ou correção de divergência)
+create or replace function lorena_recalcular_estatisticas(p_usuario_id bigint)
+returns void
+language plpgsql
+as $$
+begin
+    delete from "lorena-estatisticas_mensais" where usuario_id = p_usuario_id;
+
+    insert into "lorena-estatisticas_mensais" (
+        usuario_id, mes, tipo_servico, quantidade, soma_valor_total, soma_horas,
+        soma_urgencia, soma_especificidade, soma_complexidade, faixas_ajuste
+    )
+    select usuario_id, mes, tipo_servico, sum(quantidade), sum(soma_valor_total), sum(soma_horas),
+           sum(soma_urgencia), sum(soma_especificidade), sum(soma_complexidade),
+           jsonb_object_agg(faixa, quantidade)
+      from (
+          select usuario_id,
+                 date_trunc('month', created_at)::date as mes,
+                 coalesce(tipo_servico, '') as tipo_servico,
+                 case
+                     when grau_urgencia + grau_especificidade + grau_complexidade = 0 then '0'
+                     when grau_urgencia + grau_especificidade + grau_complexidade <= 10 then '1-10'
+                     when grau_urgencia + grau_especificidade + grau_complexidade <= 20 then '11-20'
+                     when grau_urgencia + grau_especificidade + grau_complexidade <= 40 then '21-40'
+                     else '41+'
+                 end as faixa,
+                 count(*) as quantidade,
+                 sum(valor_total) as soma_valor_total,
+                 sum(horas_analise) as soma_horas,
+                 sum(grau_urgencia) as soma_urgencia,
+                 sum(grau_especificidade) as soma_especificidade,
+                 sum(grau_complexidade) as soma_complexidade
+            from "lorena-orcamentos"
+           where usuario_id = p_usuario_id
+           group by 1, 2, 3, 4
+      ) por_faixa
+     group by usuario_id, mes, tipo_servico;
+end;
+$$;
+
+-- Backfill inicial
+select lorena_recalcular_estatisticas(id) from "lorena-usuarios";
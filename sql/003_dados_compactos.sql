@@ -0,0 +1,24 @@
+-- dados_completos compacto: só os campos do payload que não têm coluna própria
+-- (ver orcamentos.py). As linhas novas já são gravadas assim; as antigas são
+-- convertidas por `flask --app app compactar-orcamentos`, que usa a função abaixo.
+
+-- Grava dados_completos de um lote de orçamentos em um único update.
+-- p_itens: [{"id": 1, "dados_completos": "2:{...}" ou null}]
+-- Só altera linhas ainda no formato antigo, então repetir um lote é inofensivo.
+create or replace function lorena_gravar_dados_completos(p_itens jsonb)
+returns integer
+language sql
+as $$
+    with alteradas as (
+        update "lorena-orcamentos" o
+           set dados_completos = i.dados_completos
+          from jsonb_to_recordset(p_itens) as i(id bigint, dados_completos text)
+         where o.id = i.id
+           and left(o.dados_completos, 1) = '{'
+        returning 1
+    )
+    select count(*)::integer from alteradas;
+$$;
+
+-- Depois da migração, o espaço das linhas antigas só volta com o vacuum:
+--   vacuum (analyze) "lorena-orcamentos";
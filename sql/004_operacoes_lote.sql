@@ -0,0 +1,30 @@
+-- Operações em lote do histórico (POST /api/orcamentos/lote).
+-- Excluir e duplicar usam delete ... in (...) e insert de várias linhas;
+-- a reprecificação grava os valores recalculados de todos os orçamentos
+-- do lote com a função abaixo, em um único update.
+
+-- p_itens: linhas completas no formato de lorena-orcamentos (só os campos de
+-- preço e dados_completos são gravados). Só altera orçamentos de p_usuario_id;
+-- devolve as linhas atualizadas.
+create or replace function lorena_atualizar_orcamentos(p_usuario_id bigint, p_itens jsonb)
+returns setof "lorena-orcamentos"
+language sql
+as $$
+    update "lorena-orcamentos" o
+       set valor_base          = i.valor_base,
+           horas_analise       = i.horas_analise,
+           grau_urgencia       = i.grau_urgencia,
+           grau_especificidade = i.grau_especificidade,
+           grau_complexidade   = i.grau_complexidade,
+           ajustes             = i.ajustes,
+           valor_ajustado      = i.valor_ajustado,
+           taxa_horaria        = i.taxa_horaria,
+           custo_horas_analise = i.custo_horas_analise,
+           subtotal_fixo       = i.subtotal_fixo,
+           valor_total         = i.valor_total,
+           dados_completos     = i.dados_completos
+      from jsonb_populate_recordset(null::"lorena-orcamentos", p_itens) as i
+     where o.id = i.id
+       and o.usuario_id = p_usuario_id
+    returning o.*;
+$$;
@@ -0,0 +1,25 @@
+-- Coluna busca com a mesma normalização de paginacao.normalizar_busca:
+-- NFKD, sem marcas combinantes (acentos), minúsculas e espaços colapsados.
+-- O backfill de 001 usava unaccent e não colapsava espaços, então parte das
+-- linhas antigas não casava com o termo normalizado pelo app (espaço duplo,
+-- ligaduras, letras que o unaccent troca mas o NFKD mantém).
+
+create or replace function lorena_normalizar_busca(p_texto text)
+returns text
+language sql
+immutable
+as $$
+    select btrim(regexp_replace(
+        lower(regexp_replace(
+            normalize(coalesce(p_texto, ''), nfkd),
+            '[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]', '', 'g'
+        )),
+        '[[:space:]]+', ' ', 'g'
+    ));
+$$;
+
+-- Só reescreve as linhas que divergem (pode ser executado de novo)
+update "lorena-orcamentos"
+   set busca = lorena_normalizar_busca(coalesce(nome_cliente, '') || ' ' || coalesce(tipo_servico, ''))
+ where busca is distinct from
+       lorena_normalizar_busca(coalesce(nome_cliente, '') || ' ' || coalesce(tipo_servico, ''));